@@ -36,6 +36,27 @@ class Actions:
 
         return possible
 
+    @staticmethod
+    def get_cooperative_actions(pos, world):
+        """
+        Return the actions available for a robot following a reserved plan. The reservations keep moving robots
+        apart, so only walls and robots that stay in place this time step block a move.
+        :param pos: position to be checked
+        :param world:
+        :return: (list)actions
+        """
+        x, y = pos
+        possible = [Actions.STOP]
+        for action in [Actions.E, Actions.W, Actions.S, Actions.N]:
+            target = [x + action[0], y + action[1]]
+            if world.is_wall(target):
+                continue
+            robot = world.find_robot_at(target)
+            if robot and (not robot.path or robot.path[0] == Actions.STOP):
+                continue
+            possible.append(action)
+        return possible
+
     @staticmethod
     def get_nearby_locations(pos, world):
         """
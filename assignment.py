@@ -0,0 +1,67 @@
+import numpy
+
+
+def linear_sum_assignment(cost):
+    """
+    Hungarian algorithm with potentials (shortest augmenting paths), O(n^2 m) for n rows and m columns,
+    with the work over the columns done on NumPy arrays. Every row of a matrix with no more rows than columns
+    is assigned, otherwise every column is.
+    :param cost: (numpy array) n x m matrix of finite costs
+    :return: (list)(row, column) pairs of a minimum cost assignment
+    """
+    cost = numpy.asarray(cost, dtype=float)
+    if cost.shape[0] > cost.shape[1]:
+        return [(row, col) for col, row in linear_sum_assignment(cost.T)]
+    n, m = cost.shape
+    if not n:
+        return []
+
+    # Index 0 of the column arrays is a virtual column, rows are numbered from 1 in p
+    u = numpy.zeros(n + 1)
+    v = numpy.zeros(m + 1)
+    p = numpy.zeros(m + 1, dtype=int)  # column: row assigned to it
+    way = numpy.zeros(m + 1, dtype=int)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = numpy.full(m + 1, numpy.inf)
+        used = numpy.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used
+            free[0] = False
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            better = free[1:] & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+            candidates = numpy.where(free[1:], minv[1:], numpy.inf)
+            j1 = int(numpy.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    return [(p[j] - 1, j - 1) for j in range(1, m + 1) if p[j]]
+
+
+def finite_assignment(cost):
+    """
+    Minimum cost assignment of a matrix with inf for the pairs that cannot be assigned. These pairs get a cost
+    above any finite assignment, so they are only used where no assignment of finite pairs covers as many rows
+    or columns, and are left for the caller to drop.
+    :param cost: (numpy array) n x m matrix
+    :return: (list)(row, column) pairs
+    """
+    reachable = numpy.isfinite(cost)
+    if not reachable.all():
+        cost = cost.copy()
+        cost[~reachable] = (numpy.abs(cost[reachable]).sum() + 1) if reachable.any() else 1
+    return linear_sum_assignment(cost)
@@ -0,0 +1,262 @@
+from simulation import Simulation
+from world import WorldState
+from task import Task, TaskAllocation, sample_orders
+from search import PathFind
+from hierarchical import HierarchicalPlanner
+from layout import LAYOUT_MAP
+from timeit import default_timer
+import argparse
+import distance
+import platform
+import random
+import search
+import numpy
+import util
+import json
+import sys
+import os
+
+SEED = 0
+
+# Fixed layouts plus generated floors larger than any of them
+LAYOUTS = {'1': LAYOUT_MAP['1'],
+           '2': LAYOUT_MAP['2'],
+           '3': LAYOUT_MAP['3'],
+           '4': LAYOUT_MAP['4'],
+           'g200': LAYOUT_MAP['g200'],
+           'g500': LAYOUT_MAP['g500']}
+
+
+class PathProbe():
+    """
+    Stand-in robot for timing a single path search, it is not registered in the world so it blocks nothing
+    """
+
+    def __init__(self, world, start, goal):
+        self.world = world
+        self.pos = list(start)
+        self.task = [Task(world=world, pos=list(goal), isStation=True)]
+
+
+def configure():
+    """
+    Set the simulation constants used by every benchmark
+    """
+    util.GRAPHICS_ON = 0
+    util.INITIAL_TASK = 10
+    util.ROBOT_CAPACITY = 10
+    util.TEMPORAL_PRIORITY_FACTOR = 5
+    util.TASK_TIME_INTERVAL = 40
+
+
+def make_world(layout, mode=10):
+    """
+    Build an empty world on a benchmark layout
+    :param layout: key of LAYOUTS
+    :param mode:
+    :return: world
+    """
+    width, height, grid_size, wall_layout, stations, grid_cost = LAYOUTS[layout]()
+    return WorldState(width=width, height=height, gridSize=grid_size, layout=wall_layout, stations=stations,
+                      gridCost=grid_cost, mode=mode)
+
+
+def sample_cells(world, num, rng):
+    """
+    Draw free cells of the world
+    :param world:
+    :param num:
+    :param rng: random.Random
+    :return: (list)position
+    """
+    xs, ys = numpy.nonzero(world.gridCost.walls == 0)
+    cells = zip(xs.tolist(), ys.tolist())
+    return [list(rng.choice(cells)) for i in range(num)]
+
+
+def measure(name, layout, params, calls, function):
+    """
+    Time calls invocations of function
+    :return: (dict) result record
+    """
+    start = default_timer()
+    for i in range(calls):
+        function(i)
+    seconds = default_timer() - start
+    record = {'benchmark': name, 'layout': layout, 'params': params, 'calls': calls, 'seconds': seconds,
+              'perCall': seconds / calls}
+    print >> sys.__stdout__, '%-28s %-5s %-32s %10.6f s/call' % (name, layout, json.dumps(params, sort_keys=True),
+                                                                  record['perCall'])
+    return record
+
+
+def bench_path_find(layout, pairs):
+    world = make_world(layout)
+    rng = random.Random(SEED)
+    starts, goals = sample_cells(world, pairs, rng), sample_cells(world, pairs, rng)
+    probes = [PathProbe(world, starts[i], goals[i]) for i in range(pairs)]
+    # Heuristic rows are shared by all searches to the same goal during a run, build them first
+    for probe in probes:
+        PathFind(probe)
+    return measure('PathFind.perform_a_star_search', layout, {'pairs': pairs}, pairs,
+                   lambda i: PathFind(probes[i]).perform_a_star_search())
+
+
+def bench_a_star_planning(layout, pairs):
+    world = make_world(layout)
+    rng = random.Random(SEED)
+    starts, goals = sample_cells(world, pairs, rng), sample_cells(world, pairs, rng)
+    return measure('search.a_star_planning', layout, {'pairs': pairs}, pairs,
+                   lambda i: search.a_star_planning(world, starts[i], goals[i]))
+
+
+def bench_hierarchical_planning(layout, pairs):
+    world = make_world(layout)
+    rng = random.Random(SEED)
+    planner = HierarchicalPlanner(world)
+    # The paths inside the clusters are shared by all searches during a run, build them first
+    planner.precompute()
+    starts, goals = sample_cells(world, pairs, rng), sample_cells(world, pairs, rng)
+    probes = [PathProbe(world, starts[i], goals[i]) for i in range(pairs)]
+    return measure('HierarchicalPlanner.plan', layout, {'pairs': pairs}, pairs,
+                   lambda i: planner.plan(probes[i]))
+
+
+def bench_sort_task(layout, calls):
+    world = make_world(layout)
+    rng = random.Random(SEED)
+    cells = []
+    for pos in sample_cells(world, int(util.ROBOT_CAPACITY * util.TEMPORAL_PRIORITY_FACTOR), rng):
+        if pos not in cells:
+            cells.append(pos)
+    # Adding a candidate task computes its savings, filling its distance oracle row on layouts up to
+    # distance.HEURISTIC_ROW_LIMIT free cells
+    add = measure('WorldState.add_task', layout, {'tasks': len(cells)}, len(cells),
+                  lambda i: world.add_task(cells[i]))
+    return [add, measure('search.sort_task', layout, {'tasks': len(world.taskCache)}, calls,
+                         lambda i: search.sort_task(world))]
+
+
+def bench_closest_available_robot(layout, robots, queries):
+    world = make_world(layout)
+    rng = random.Random(SEED)
+    for pos in sample_cells(world, robots, rng):
+        if not world.has_robot_at(pos):
+            world.add_robot(pos)
+    targets = sample_cells(world, queries, rng)
+    # Task positions are queried over and over during a run, build their distance oracle rows first. Larger
+    # layouts keep a partial search per position instead, it is timed from scratch
+    if len(world.distanceOracle) <= distance.HEURISTIC_ROW_LIMIT:
+        for pos in targets:
+            world.distanceOracle.row_to(pos)
+    return measure('get_closest_available_robot', layout, {'robots': len(world.robots)}, queries,
+                   lambda i: TaskAllocation.get_closest_available_robot(world, targets[i]))
+
+
+def bench_sample_orders(layout, tasks, calls):
+    world = make_world(layout, mode=1)
+    rng = random.Random(SEED)
+    for pos in sample_cells(world, tasks, rng):
+        if not world.has_task_at(pos):
+            world.add_task(pos)
+    return measure('task.sample_orders', layout, {'tasks': len(world.tasks)}, calls,
+                   lambda i: sample_orders(world))
+
+
+def bench_tick(layout, mode, robots, warm_up, ticks, planner='astar'):
+    util.SIMULATION_TIME = warm_up + ticks
+    simulation = Simulation(layout=LAYOUTS[layout], mode=mode, fixed_robots=robots, seed=SEED, planner=planner)
+    simulation.setup()
+    for i in range(warm_up):
+        simulation.step()
+    params = {'mode': mode, 'robots': robots}
+    if planner != 'astar':
+        params['planner'] = planner
+    return measure('tick', layout, params, ticks, lambda i: simulation.step())
+
+
+def run(quick=False):
+    """
+    Run the whole suite
+    :param quick: smaller sizes for a fast sanity run
+    :return: (list) result records
+    """
+    configure()
+    scale = 1 if quick else 4
+    results = []
+    for layout in ['1', '2', '3', '4', 'g200', 'g500']:
+        pairs = 5 * scale if layout.startswith('g') else 25 * scale
+        results.append(bench_path_find(layout, pairs))
+        results.append(bench_a_star_planning(layout, pairs))
+        if layout.startswith('g'):
+            # Smaller floors are left to A* by the hierarchical planner
+            results.append(bench_hierarchical_planning(layout, pairs))
+    for layout in ['2', '3', '4', 'g200']:
+        results.extend(bench_sort_task(layout, 5 * scale))
+    for layout in ['2', '4', 'g200']:
+        for robots in [20, 100, 500]:
+            results.append(bench_closest_available_robot(layout, robots, 250 * scale))
+    for tasks in [10, 100, 1000]:
+        results.append(bench_sample_orders('g200', tasks, 100 * scale))
+    for layout, mode in [('2', 10), ('4', 10), ('4', 1), ('g200', 10)]:
+        for robots in [5, 20, 50]:
+            results.append(bench_tick(layout, mode, robots, 10 * scale, 25 * scale))
+    for planner in ['cooperative', 'dstar']:
+        for layout, mode in [('4', 10), ('4', 1)]:
+            results.append(bench_tick(layout, mode, 20, 10 * scale, 25 * scale, planner))
+    results.append(bench_tick('g200', 10, 20, 10 * scale, 25 * scale, 'hpa'))
+    return results
+
+
+def result_key(record):
+    return record['benchmark'], record['layout'], json.dumps(record['params'], sort_keys=True)
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print the per-call time of every result relative to a baseline
+    :param results:
+    :param baseline: (list) result records of an earlier run
+    :param tolerance: relative slowdown reported as a regression
+    :return: number of regressions
+    """
+    reference = dict((result_key(record), record) for record in baseline)
+    regressions = 0
+    for record in results:
+        key = result_key(record)
+        if key not in reference:
+            continue
+        ratio = record['perCall'] / reference[key]['perCall']
+        flag = ''
+        if ratio > 1 + tolerance:
+            flag = 'REGRESSION'
+            regressions += 1
+        print '%-28s %-5s %-32s %6.2fx %s' % (key[0], key[1], key[2], ratio, flag)
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                     description="Benchmark path planning, allocation and simulation ticks")
+    parser.add_argument('-o', default='benchmark.json', help="output json file")
+    parser.add_argument('-c', default=None, help="baseline json file to compare against")
+    parser.add_argument('-tol', type=float, default=0.2, help="relative slowdown reported as a regression")
+    parser.add_argument('-q', action='store_true', help="quick run with smaller sizes")
+    args = parser.parse_args()
+
+    # The simulation prints progress messages, keep them out of the report
+    sys.stdout = open(os.devnull, 'w')
+    results = run(quick=args.q)
+    sys.stdout = sys.__stdout__
+
+    report = {'python': platform.python_version(), 'numpy': numpy.__version__, 'machine': platform.machine(),
+              'processor': platform.processor(), 'quick': args.q, 'results': results}
+    with open(args.o, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print 'results written to %s' % args.o
+
+    if args.c:
+        with open(args.c) as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, args.tol):
+            sys.exit(1)
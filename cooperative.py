@@ -0,0 +1,262 @@
+from heapq import heappush, heappop
+from layout import DIRECTIONS
+import util
+
+# Cost of waiting one time step in place
+WAIT_COST = 1
+# Time steps a plan may take beyond the wall-only travel cost to the goal
+MAX_DELAY = 30
+# Upper bound of the states expanded by a single space-time search
+MAX_EXPANSIONS = 10000
+# Smaller bound when another robot is parked at the goal, the search can then only get the robot closer
+APPROACH_EXPANSIONS = 500
+
+
+class ReservationTable():
+    """
+    Shared space-time reservations of the fleet. Time steps are world timer values, a robot that reserved
+    (cell, t) is at that cell when the world update of tick t starts.
+    """
+
+    def __init__(self):
+        self.vertices = {}  # (x, y): {t: robot}
+        self.edges = {}  # ((x1, y1), (x2, y2), t): robot moving from (x1, y1) at t to (x2, y2) at t + 1
+        self.parked = {}  # (x, y): (robot, t) the robot stays at the cell from t on
+        self.owned = {}  # robot: ((list)vertex keys, (list)edge keys, parked cell)
+
+    def reserve(self, robot, cells, start):
+        """
+        Reserve a plan and park the robot at its last cell
+        :param robot:
+        :param cells: (list)(tuple)position, one per time step
+        :param start: time step of cells[0]
+        """
+        vertex_keys, edge_keys, parked_cell = self.owned.setdefault(robot, ([], [], None))
+        for k, cell in enumerate(cells):
+            self.vertices.setdefault(cell, {})[start + k] = robot
+            vertex_keys.append((cell, start + k))
+            if k and cells[k - 1] != cell:
+                edge = (cells[k - 1], cell, start + k - 1)
+                self.edges[edge] = robot
+                edge_keys.append(edge)
+        self.park(robot, cells[-1], start + len(cells) - 1)
+
+    def park(self, robot, cell, t):
+        """
+        Reserve a cell for a robot from t on
+        :param robot:
+        :param cell:
+        :param t:
+        """
+        vertex_keys, edge_keys, parked_cell = self.owned.setdefault(robot, ([], [], None))
+        if parked_cell is not None and self.parked.get(parked_cell, (None,))[0] is robot:
+            del self.parked[parked_cell]
+        self.parked[cell] = (robot, t)
+        self.owned[robot] = (vertex_keys, edge_keys, cell)
+
+    def release(self, robot):
+        """
+        Drop every reservation of a robot
+        :param robot:
+        """
+        if robot not in self.owned:
+            return
+        vertex_keys, edge_keys, parked_cell = self.owned.pop(robot)
+        for cell, t in vertex_keys:
+            times = self.vertices.get(cell)
+            if times is not None and times.get(t) is robot:
+                del times[t]
+                if not times:
+                    del self.vertices[cell]
+        for edge in edge_keys:
+            if self.edges.get(edge) is robot:
+                del self.edges[edge]
+        if parked_cell is not None and self.parked.get(parked_cell, (None,))[0] is robot:
+            del self.parked[parked_cell]
+
+    def is_free(self, robot, cell, t):
+        """
+        Whether no other robot is at cell at time step t
+        :return: boolean
+        """
+        owner = self.vertices.get(cell, {}).get(t)
+        if owner is not None and owner is not robot:
+            return False
+        parked = self.parked.get(cell)
+        return parked is None or parked[0] is robot or parked[1] > t
+
+    def is_swap(self, robot, cell1, cell2, t):
+        """
+        Whether another robot moves from cell2 to cell1 while the robot moves from cell1 to cell2
+        :return: boolean
+        """
+        owner = self.edges.get((cell2, cell1, t))
+        return owner is not None and owner is not robot
+
+    def can_stay(self, robot, cell, t):
+        """
+        Whether the robot can stay at cell from time step t on
+        :return: boolean
+        """
+        for t2, owner in self.vertices.get(cell, {}).iteritems():
+            if t2 >= t and owner is not robot:
+                return False
+        parked = self.parked.get(cell)
+        return parked is None or parked[0] is robot
+
+
+class CooperativePlanner():
+    """
+    Cooperative path planning: every robot plans a space-time A* path against the reservations of the robots
+    that planned before it and reserves the result, so the plans of the fleet do not collide.
+    Plans are kept until the robot leaves its plan or reaches its end with a different goal.
+    """
+
+    def __init__(self, world):
+        self.world = world
+        self.table = ReservationTable()
+        self.plans = {}  # robot: (goal, start time, cells, dir_path)
+
+    def begin_tick(self):
+        """
+        Park the robots that are not following a plan at their cells, so the robots planning in this tick
+        go around them
+        """
+        now = self.world.timer
+        for robot in self.world.robots:
+            if not self.is_on_plan(robot, now):
+                self.plans.pop(robot, None)
+                self.table.release(robot)
+                self.table.park(robot, (robot.pos[0], robot.pos[1]), now)
+
+    def is_on_plan(self, robot, now):
+        """
+        Whether the robot is where its plan expects it at time step now
+        :return: boolean
+        """
+        plan = self.plans.get(robot)
+        if plan is None:
+            return False
+        goal, start, cells, dir_path = plan
+        return cells[min(now - start, len(cells) - 1)] == (robot.pos[0], robot.pos[1])
+
+    def plan(self, robot):
+        """
+        Return the remaining directional path of the robot to its current task, planning a new one if needed
+        :param robot:
+        :return: (list)direction
+        """
+        now = self.world.timer
+        goal = (robot.task[0].pos[0], robot.task[0].pos[1]) if robot.task else None
+        plan = self.plans.get(robot)
+        if plan is not None and self.is_on_plan(robot, now):
+            # A plan is followed to its end even if the goal changed meanwhile, like the independent planner does
+            finished = now - plan[1] >= len(plan[3])
+            if plan[0] == goal or (plan[0] is not None and not finished):
+                return plan[3][now - plan[1]:]
+
+        self.table.release(robot)
+        start = (robot.pos[0], robot.pos[1])
+        cells, reached = [start], False
+        if goal is not None:
+            cells, reached = self.search(robot, start, goal, now)
+            self.world.metrics.count('searches')
+        self.table.reserve(robot, cells, now)
+        dir_path = [[cells[k + 1][0] - cells[k][0], cells[k + 1][1] - cells[k][1]] for k in range(len(cells) - 1)]
+        # A plan that stops short of the goal is replaced in the next tick
+        self.plans[robot] = (goal if reached else None, now, cells, dir_path)
+        return dir_path[:]
+
+    def search(self, robot, start, goal, now):
+        """
+        Space-time A* from start at time step now to goal, over moves and waits that keep clear of the
+        reservations of the other robots. If the goal cannot be reached, the path to the reachable cell
+        closest to the goal is returned instead.
+        :param robot:
+        :param start: (tuple)position
+        :param goal: (tuple)position
+        :param now: time step
+        :return: (list)(tuple)position per time step, boolean goal reached
+        """
+        grid_cost = self.world.gridCost
+        oracle = self.world.distanceOracle
+        table = self.table
+        row = oracle.heuristic_row(goal)
+
+        def heuristic(cell):
+            i = None if row is None else oracle.cell_index(cell)
+            if i is None:
+                return util.calculate_manhattan_distance(cell, goal)
+            return row.item(i)
+
+        start_h = heuristic(start)
+        if start_h == float('inf'):
+            return [start], False
+        horizon = now + int(start_h) + MAX_DELAY
+        max_expansions = MAX_EXPANSIONS
+        parked = table.parked.get(goal)
+        if parked is not None and parked[0] is not robot:
+            max_expansions = APPROACH_EXPANSIONS
+
+        start_state = (start, now)
+        came_from = {start_state: None}
+        cost_so_far = {start_state: 0}
+        frontier = [(start_h, 0, start_state)]
+        push_count = 1
+        closed_set = set()
+        best_state, best_key = start_state, (start_h, 0)
+
+        while frontier and len(closed_set) < max_expansions:
+            f, order, state = heappop(frontier)
+            if state in closed_set:
+                continue
+            closed_set.add(state)
+            cell, t = state
+            g = cost_so_far[state]
+            h = f - g
+
+            if table.can_stay(robot, cell, t):
+                if cell == goal:
+                    self.world.metrics.count('expansions', len(closed_set))
+                    return self.reconstruct_path(came_from, state), True
+                if (h, g) < best_key:
+                    best_state, best_key = state, (h, g)
+            if t >= horizon:
+                continue
+
+            for direction in DIRECTIONS + [(0, 0)]:
+                next_cell = (cell[0] + direction[0], cell[1] + direction[1])
+                if direction == (0, 0):
+                    step_cost = WAIT_COST
+                else:
+                    step_cost = grid_cost.get(cell + next_cell)
+                    if step_cost is None or step_cost == float('inf'):
+                        continue
+                    if table.is_swap(robot, cell, next_cell, t):
+                        continue
+                if not table.is_free(robot, next_cell, t + 1):
+                    continue
+                next_state = (next_cell, t + 1)
+                new_cost = g + step_cost
+                if next_state not in cost_so_far or new_cost < cost_so_far[next_state]:
+                    cost_so_far[next_state] = new_cost
+                    came_from[next_state] = state
+                    heappush(frontier, (new_cost + heuristic(next_cell), push_count, next_state))
+                    push_count += 1
+
+        self.world.metrics.count('expansions', len(closed_set))
+        return self.reconstruct_path(came_from, best_state), False
+
+    def reconstruct_path(self, came_from, state):
+        """
+        Return the cells from the start state to state
+        :param came_from:
+        :param state:
+        :return: (list)(tuple)position
+        """
+        cells = []
+        while state is not None:
+            cells.append(state[0])
+            state = came_from[state]
+        cells.reverse()
+        return cells
@@ -0,0 +1,264 @@
+from collections import OrderedDict
+from heapq import heappush, heappop
+import numpy
+
+# Rows needed by path finding heuristics are only computed on demand for layouts up to this many free cells
+HEURISTIC_ROW_LIMIT = 20000
+# Cells kept at most over all the cached rows of one direction, the least recently used rows are dropped first
+ROW_CACHE_CELLS = 8000000
+
+
+class DistanceOracle():
+    """
+    Wall-only travel costs between free cells of a layout, following the directional costs of grid_cost.
+    The cell index is built on the first query and rows are computed with Dijkstra on first use and kept in a
+    least recently used cache of ROW_CACHE_CELLS cells per direction, so a repeated query is a single array lookup.
+    Small layouts keep a row for every cell, large ones only the most recently used rows.
+    """
+
+    def __init__(self, grid_cost):
+        """
+        :param grid_cost: (dict)(x1, y1, x2, y2): cost of moving from (x1, y1) to (x2, y2)
+        """
+        self.gridCost = grid_cost
+        self.cells = None
+        self.index = None
+        self.fromRows = OrderedDict()  # cell index: row, least recently used first
+        self.toRows = OrderedDict()
+        self.searches = OrderedDict()  # cell index: (dist, frontier, radius) of a partial reverse search
+
+    def build(self):
+        """
+        Build the cell index and the adjacency of the layout
+        """
+        grid_cost = self.gridCost
+        self.cells = sorted(set((x1, y1) for (x1, y1, x2, y2) in grid_cost))
+        self.index = dict((cell, i) for i, cell in enumerate(self.cells))
+        self.successors = [[] for cell in self.cells]
+        self.predecessors = [[] for cell in self.cells]
+        for (x1, y1, x2, y2), cost in grid_cost.iteritems():
+            if cost == float('inf') or (x2, y2) not in self.index:
+                continue
+            i = self.index[x1, y1]
+            j = self.index[x2, y2]
+            self.successors[i].append((j, cost))
+            self.predecessors[j].append((i, cost))
+
+    def __len__(self):
+        if self.cells is None:
+            self.build()
+        return len(self.cells)
+
+    def cell_index(self, pos):
+        """
+        Return the row index of a free cell, None for any other position
+        :param pos:
+        :return: index
+        """
+        if self.index is None:
+            self.build()
+        return self.index.get((pos[0], pos[1]))
+
+    def row_from(self, pos):
+        """
+        Travel costs from pos to every cell, indexed by self.index
+        :param pos:
+        :return: numpy array
+        """
+        return self.cached_row(self.fromRows, self.cell_index(pos), self.successors)
+
+    def row_to(self, pos):
+        """
+        Travel costs from every cell to pos, indexed by self.index
+        :param pos:
+        :return: numpy array
+        """
+        return self.cached_row(self.toRows, self.cell_index(pos), self.predecessors)
+
+    def cached_row(self, rows, i, adjacency):
+        """
+        Return the row of a cell from a row cache, computing it and evicting the least recently used rows over the
+        cache size when it is missing
+        :param rows: self.fromRows or self.toRows
+        :param i: cell index
+        :param adjacency: self.successors or self.predecessors
+        :return: numpy array
+        """
+        row = rows.pop(i, None)
+        if row is None:
+            row = self.dijkstra(i, adjacency)
+            while rows and len(rows) >= self.row_cache_size():
+                rows.popitem(last=False)
+        rows[i] = row
+        return row
+
+    def row_cache_size(self):
+        """
+        Return the number of rows kept per direction
+        :return: rows
+        """
+        return max(ROW_CACHE_CELLS // len(self), 1)
+
+    def heuristic_row(self, pos):
+        """
+        Travel costs from every cell to pos for an A* heuristic, or None when pos is not a free cell or the layout
+        is too large for a full Dijkstra per goal to pay off and the row is not known yet
+        :param pos:
+        :return: numpy array or None
+        """
+        if self.cells is None and len(self.gridCost) > 4 * HEURISTIC_ROW_LIMIT:
+            return None
+        i = self.cell_index(pos)
+        if i is None:
+            return None
+        if i not in self.toRows and len(self.cells) > HEURISTIC_ROW_LIMIT:
+            return None
+        return self.row_to(pos)
+
+    def distance(self, pos1, pos2):
+        """
+        Travel cost from pos1 to pos2, inf if pos2 cannot be reached
+        :param pos1:
+        :param pos2:
+        :return: cost
+        """
+        return float(self.row_from(pos1)[self.cell_index(pos2)])
+
+    def estimate(self, pos1, pos2):
+        """
+        Travel cost from pos1 to pos2 where no new row has to be computed for it on a large layout: on layouts up
+        to HEURISTIC_ROW_LIMIT free cells or with a cached row of either position it is the travel cost, otherwise
+        the manhattan distance, which never overestimates it
+        :param pos1:
+        :param pos2:
+        :return: cost
+        """
+        i = self.cell_index(pos1)
+        j = self.cell_index(pos2)
+        if i is not None and j is not None:
+            if len(self.cells) <= HEURISTIC_ROW_LIMIT or i in self.fromRows:
+                return float(self.row_from(pos1)[j])
+            if j in self.toRows:
+                return float(self.row_to(pos2)[i])
+        return float(abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1]))
+
+    def costs_to(self, pos, cells, k=None):
+        """
+        Travel costs from some cells to pos. They come from the row of pos where it is cached or the layout has up to
+        HEURISTIC_ROW_LIMIT free cells, or with k from the kept reverse search of pos, see closest_costs. Otherwise
+        the row of pos is computed and cached, as the task cells ranked over and over are few.
+        :param pos:
+        :param cells: (numpy array) cell indices
+        :param k: number of closest cells needed
+        :return: (numpy array) float costs, inf for cells that cannot reach pos or, with k, lie beyond the search,
+                 None if pos is not a free cell
+        """
+        i = self.cell_index(pos)
+        if i is None:
+            return None
+        if k is None or k >= len(cells) or len(self.cells) <= HEURISTIC_ROW_LIMIT or i in self.toRows:
+            return self.row_to(pos)[cells].astype(float)
+        return self.closest_costs(i, cells, k)
+
+    def closest_costs(self, i, cells, k):
+        """
+        Travel costs from cells to cell i by a reverse Dijkstra from i that stops once the k closest cells, and the
+        ones as close as the k-th, are settled. The search is kept in a least recently used cache of
+        row_cache_size() searches and resumed when a later query needs more of it, so it only grows as far as the
+        robots are.
+        :param i: cell index
+        :param cells: (numpy array) cell indices
+        :param k: number of closest cells needed
+        :return: (numpy array) float costs, inf for the cells beyond the search
+        """
+        search = self.searches.pop(i, None)
+        if search is None:
+            dist = [float('inf')] * len(self.cells)
+            dist[i] = 0
+            search = (dist, [(0, i)], 0)
+        dist, frontier, radius = search
+        # Every cell up to radius is settled, the search goes on until k of the cells are and then settles the
+        # remaining cells at the same cost, so ties are ranked like in a full row
+        targets = set(cells.tolist())
+        settled = sum(1 for j in targets if dist[j] <= radius)
+        predecessors = self.predecessors
+        while frontier and (settled < k or frontier[0][0] <= radius):
+            cost, j = heappop(frontier)
+            if cost > dist[j]:
+                continue
+            radius = cost
+            if j in targets:
+                settled += 1
+            for l, step_cost in predecessors[j]:
+                new_cost = cost + step_cost
+                if new_cost < dist[l]:
+                    dist[l] = new_cost
+                    heappush(frontier, (new_cost, l))
+        while self.searches and len(self.searches) >= self.row_cache_size():
+            self.searches.popitem(last=False)
+        self.searches[i] = (dist, frontier, radius)
+        costs = numpy.array([dist[j] for j in cells.tolist()])
+        costs[costs > radius] = float('inf')
+        return costs
+
+    def path(self, pos1, pos2):
+        """
+        A wall-only shortest path from pos1 to pos2, traced back from pos2 over the row of pos1
+        :param pos1:
+        :param pos2:
+        :return: (list)(tuple)position from pos1 to pos2, None if pos2 cannot be reached
+        """
+        row = self.row_from(pos1)
+        i = self.cell_index(pos2)
+        start = self.cell_index(pos1)
+        if i is None or row[i] == float('inf'):
+            return None
+        path = [self.cells[i]]
+        while i != start:
+            if len(path) > len(self.cells):
+                return None
+            i = min(self.predecessors[i], key=lambda (j, cost): row.item(j) + cost)[0]
+            path.append(self.cells[i])
+        path.reverse()
+        return path
+
+    def precompute(self, positions=None):
+        """
+        Compute the rows of the given positions, or of every free cell, ahead of time. Only the last
+        row_cache_size() of them are kept.
+        :param positions: (list)position
+        """
+        if self.cells is None:
+            self.build()
+        if positions is None:
+            positions = self.cells
+        for pos in positions:
+            self.row_from(pos)
+
+    def dijkstra(self, source, adjacency, targets=None):
+        """
+        Single source shortest travel costs over an adjacency list
+        :param source: cell index
+        :param adjacency: self.successors or self.predecessors
+        :param targets: cell indices the search can stop at once they are all settled, the costs of the other
+                        cells are then not final
+        :return: numpy array
+        """
+        dist = [float('inf')] * len(self.cells)
+        dist[source] = 0
+        frontier = [(0, source)]
+        remaining = None if targets is None else set(targets.tolist())
+        while frontier:
+            cost, i = heappop(frontier)
+            if cost > dist[i]:
+                continue
+            if remaining is not None:
+                remaining.discard(i)
+                if not remaining:
+                    break
+            for j, step_cost in adjacency[i]:
+                new_cost = cost + step_cost
+                if new_cost < dist[j]:
+                    dist[j] = new_cost
+                    heappush(frontier, (new_cost, j))
+        return numpy.array(dist, dtype=numpy.float32)
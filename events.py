@@ -0,0 +1,207 @@
+from simulation import Simulation
+from collections import deque
+from heapq import heappush, heappop
+from timeit import default_timer
+import itertools
+import util
+
+# Ticks a robot waits at a task after its progress is complete, like the task timer of WorldState.check_tasks_status
+HANDOVER_TICKS = 10
+# Tasks added at every task time interval, like Simulation.step
+TASKS_PER_INTERVAL = 14
+
+
+class EventSimulation(Simulation):
+    """
+    Discrete-event version of the Clarke and Wright mode. Instead of updating the world every time step, the clock
+    jumps from one event to the next: task arrivals, random or from an order stream, robots leaving the station with
+    a route, reaching a task, completing a pick and returning to the station. Allocation, picks and deliveries go through the same world and
+    robot methods as the time stepped simulation, so rewards and mileage are accounted the same way. Robots follow
+    wall-only shortest paths and do not block each other, so long horizons run in a fraction of the time.
+    """
+
+    def __init__(self, **kwargs):
+        """
+        Same parameters as Simulation, the mode has to be 10
+        """
+        Simulation.__init__(self, **kwargs)
+        if self.world.mode != 10:
+            raise ValueError('the discrete-event simulation only supports mode 10')
+        self.events = []  # (time, order, kind, robot)
+        self.order = itertools.count()
+        self.waiting = deque()  # robots at the station without tasks, in arrival order
+        self.dispatching = False
+        self.legs = {}  # robot: ((list)cells of the current leg, departure time)
+        self.idleSince = {}  # robot: time it arrived at the station
+
+    def setup(self):
+        """
+        Populate the world and queue every robot at the station
+        """
+        Simulation.setup(self)
+        for robot in self.world.robots:
+            self.idleSince[robot] = 0
+            self.waiting.append(robot)
+        if self.orders:
+            self.schedule_orders()
+        else:
+            self.schedule(0, 'arrival')
+
+    def schedule(self, time, kind, robot=None):
+        """
+        Queue an event
+        :param time: world timer value the event happens at
+        :param kind: 'arrival', 'dispatch', 'reach', 'pick' or 'return'
+        :param robot:
+        """
+        heappush(self.events, (time, next(self.order), kind, robot))
+
+    def step(self):
+        """
+        Advance the clock to the next event and handle every event due at that time
+        """
+        world = self.world
+        metrics = world.metrics
+        start = default_timer()
+        if not self.events or self.events[0][0] >= util.SIMULATION_TIME:
+            self.finish()
+        else:
+            world.timer = self.events[0][0]
+            while self.events and self.events[0][0] == world.timer:
+                time, order, kind, robot = heappop(self.events)
+                metrics.count('events')
+                if kind == 'arrival':
+                    self.on_arrival()
+                elif kind == 'dispatch':
+                    self.on_dispatch()
+                elif kind == 'reach':
+                    self.on_reach(robot)
+                elif kind == 'pick':
+                    self.on_pick(robot)
+                else:
+                    self.on_return(robot)
+            world.graphics.update_status_bar()
+        metrics.lap('events', start)
+        metrics.end_tick()
+
+    def finish(self):
+        """
+        Stop the clock at the simulation time, the robots on their way move as far as they got by then
+        """
+        world = self.world
+        world.timer = util.SIMULATION_TIME
+        for robot, (cells, departure) in self.legs.items():
+            robot.jump(cells[:world.timer - departure + 1])
+        self.legs = {}
+        self.events = []
+
+    def schedule_orders(self):
+        """
+        Schedule an arrival at the time of the next order of the order stream
+        """
+        time = self.orders.next_time()
+        if time is not None:
+            self.schedule(max(time, self.world.timer), 'arrival')
+
+    def on_arrival(self):
+        """
+        Add the tasks due from the order stream, or the random tasks of a task time interval
+        """
+        world = self.world
+        if self.orders:
+            for pos in self.orders.due(world.timer):
+                world.add_order(pos)
+            self.schedule_orders()
+        else:
+            world.add_random_task(TASKS_PER_INTERVAL)
+            self.schedule(world.timer + util.TASK_TIME_INTERVAL, 'arrival')
+        self.dispatch()
+
+    def dispatch(self):
+        """
+        Schedule a dispatch now, unless one is pending or no robot is waiting
+        """
+        if self.waiting and not self.dispatching:
+            self.dispatching = True
+            self.schedule(self.world.timer, 'dispatch')
+
+    def on_dispatch(self):
+        """
+        Give the first waiting robot a route. Like WorldState.try_allocate_rob, at most one robot leaves the
+        station per time step.
+        """
+        world = self.world
+        self.dispatching = False
+        world.taskCache = [task for task in world.tasks if not task.assigned]
+        if not self.waiting or not world.taskCache:
+            return
+        robot = self.waiting.popleft()
+        robot.charge_battery(world.timer - self.idleSince.pop(robot))
+        world.allocate_tasks(robot)
+        if not robot.task:
+            self.idleSince[robot] = world.timer
+            self.waiting.appendleft(robot)
+            return
+        self.next_leg(robot)
+        if self.waiting and len(world.taskCache):
+            self.dispatching = True
+            self.schedule(world.timer + 1, 'dispatch')
+
+    def next_leg(self, robot):
+        """
+        Send a robot to its next task, or back to the station once it has no task or capacity left
+        :param robot:
+        """
+        world = self.world
+        oracle = world.distanceOracle
+        while robot.task and robot.capacityCount < util.ROBOT_CAPACITY:
+            cells = oracle.path(robot.pos, robot.task[0].pos)
+            if cells is not None:
+                robot.set_status("Fetching Order")
+                self.legs[robot] = (cells, world.timer)
+                self.schedule(world.timer + len(cells) - 1, 'reach', robot)
+                return
+            # A task the robot cannot reach goes back to the unassigned tasks
+            robot.task.pop(0).set_assign_status(False)
+
+        if robot.task:
+            robot.assignable = False
+        robot.return_to_station()
+        robot.set_status("Return to Station")
+        cells = oracle.path(robot.pos, robot.station.pos) or [(robot.pos[0], robot.pos[1])]
+        self.legs[robot] = (cells, world.timer)
+        self.schedule(world.timer + len(cells) - 1, 'return', robot)
+
+    def move(self, robot):
+        """
+        Move a robot to the end of its current leg
+        :param robot:
+        :return: boolean, False if the robot ran out of power on the way
+        """
+        cells, departure = self.legs.pop(robot)
+        return robot.jump(cells) == len(cells) - 1
+
+    def on_reach(self, robot):
+        if self.move(robot):
+            robot.set_status("Arrived Task Location")
+            self.schedule(self.world.timer + robot.task[0].timeCost + HANDOVER_TICKS, 'pick', robot)
+
+    def on_pick(self, robot):
+        task = robot.task[0]
+        task.set_progress(task.timeCost)
+        robot.delete_task(task)
+        self.next_leg(robot)
+
+    def on_return(self, robot):
+        if not self.move(robot):
+            return
+        world = self.world
+        robot.set_status("Waiting for Order")
+        world.add_completed_order(robot.load)
+        robot.task = []
+        robot.load = 0
+        robot.capacityCount = 0
+        robot.assignable = True
+        self.idleSince[robot] = world.timer
+        self.waiting.append(robot)
+        self.dispatch()
@@ -1,13 +1,18 @@
+from observer import WorldObserver
+from timeit import default_timer
 import Tkinter
+import util
 
 
-class MainGraphics():
-    def __init__(self, world, bgColor="black", title="Warehouse Simulation"):
+class MainGraphics(WorldObserver):
+    def __init__(self, world, bgColor="black", title="Warehouse Simulation", fps=0, interpolation=1):
         """
         Initialize the graphics
         :param world:
         :param bgColor:
         :param title:
+        :param fps: frames drawn per second at most, 0 draws a frame every time step
+        :param interpolation: intermediate frames drawn while the robots move to their new cells
         """
         self.world = world
         self.width = world.width
@@ -18,6 +23,15 @@ class MainGraphics():
         self.layout = world.layout
         self.root_window = None
         self.canvas = None
+        self.robotItems = {}
+        self.taskItems = {}
+        self.drawnPos = {}  # robot: position the robot is drawn at
+        self.movedRobots = set()
+        self.interpolation = interpolation
+        self.itemTexts = {}  # canvas item: text shown by it
+        self.fps = fps
+        self.lastFrame = None
+        self.statusBarChanged = False
         self.create_window()
         self.init_status_bar()
 
@@ -225,43 +239,181 @@ class MainGraphics():
             self.taskTimeLabels.append(self.canvas.create_text(self.width + 160, self.taskStatusBarY + 20 * (count+1), anchor=Tkinter.W, fill="white", text=str(self.world.tasks[count].timeout)))
             self.taskOrderLabels.append(self.canvas.create_text(self.width + 300, self.taskStatusBarY + 20 * (count+1), anchor=Tkinter.W, fill="white", text=str(self.world.tasks[count].order)))
 
+    def set_text(self, item, text):
+        """
+        Show a text on a canvas item, the item is only touched when the text changed since the last frame
+        :param item: canvas item
+        :param text:
+        """
+        if self.itemTexts.get(item) != text:
+            self.itemTexts[item] = text
+            self.canvas.itemconfig(item, text=text)
+
     def update_status_bar(self):
         """
-        Update the status bar
+        Mark the status bar as changed, it is drawn with the next frame
+        """
+        self.statusBarChanged = True
+
+    def draw_status_bar(self):
+        """
+        Draw the status bar
         """
-        self.canvas.itemconfig(self.taskCompletedLabel, text=str(self.world.completedOrder))
+        self.set_text(self.timerLabel, str(self.world.timer))
+        self.set_text(self.taskCountLabel, str(len(self.world.tasks)))
+        self.set_text(self.taskCompletedLabel, str(self.world.completedOrder))
         # if not self.world.completedOrder:
         #     self.canvas.itemconfig(self.taskCompletionSpeedLabel, text="N/A")
         # else:
         #     self.canvas.itemconfig(self.taskCompletionSpeedLabel,
         #                            text=str(float(self.world.timer) / float(self.world.completedOrder)))
-        self.canvas.itemconfig(self.taskRewardLabel, text=str(self.world.taskRewards)[:8])
-        self.canvas.itemconfig(self.unassignedLabel, text=str(len(self.world.taskCache)))
-        self.canvas.itemconfig(self.completedLabel, text=str(self.world.completedTask))
-        self.canvas.itemconfig(self.mileageLabel, text=str(self.world.totalMileage))
-        self.canvas.itemconfig(self.totalRewardLabel, text=str(self.world.taskRewards - self.world.totalMileage)[:8])
-
-        for i in range(len(self.world.robots)):
-            self.canvas.itemconfig(self.robotPosLabels[i], text=str(self.world.robots[i].pos))
-            self.canvas.itemconfig(self.robotStatusLabels[i], text=str(self.world.robots[i].status))
-            self.canvas.itemconfig(self.robotLoadLabels[i], text=str(self.world.robots[i].load))
-            self.canvas.itemconfig(self.robotPowerLabels[i], text=str(self.world.robots[i].power))
-            if self.world.robots[i].task:
-                if not self.world.robots[i].task[0].isStation:
-                    self.canvas.itemconfig(self.robotAssignedLabels[i], text=str(self.world.robots[i].task[0].index))
+        self.set_text(self.taskRewardLabel, str(self.world.taskRewards)[:8])
+        self.set_text(self.unassignedLabel, str(len(self.world.taskCache)))
+        self.set_text(self.completedLabel, str(self.world.completedTask))
+        self.set_text(self.mileageLabel, str(self.world.totalMileage))
+        self.set_text(self.totalRewardLabel, str(self.world.taskRewards - self.world.totalMileage)[:8])
+
+        for i in range(len(self.robotPosLabels)):
+            robot = self.world.robots[i]
+            self.set_text(self.robotPosLabels[i], str(robot.pos))
+            self.set_text(self.robotStatusLabels[i], str(robot.status))
+            self.set_text(self.robotLoadLabels[i], str(robot.load))
+            self.set_text(self.robotPowerLabels[i], str(robot.power))
+            if robot.task:
+                if not robot.task[0].isStation:
+                    self.set_text(self.robotAssignedLabels[i], str(robot.task[0].index))
                 else:
-                    self.canvas.itemconfig(self.robotAssignedLabels[i], text="Base")
+                    self.set_text(self.robotAssignedLabels[i], "Base")
             else:
-                self.canvas.itemconfig(self.robotAssignedLabels[i], text="None")
+                self.set_text(self.robotAssignedLabels[i], "None")
             task_plan = []
-            for j in range(len(self.world.robots[i].task)):
-                task_plan.append(self.world.robots[i].task[j].index)
-            self.canvas.itemconfig(self.robotTaskSequence[i], text=str(task_plan))
+            for j in range(len(robot.task)):
+                task_plan.append(robot.task[j].index)
+            self.set_text(self.robotTaskSequence[i], str(task_plan))
 
         if self.world.mode in [0, 1]:
             for i in range(len(self.taskOrderLabels)):
-                self.canvas.itemconfig(self.taskOrderLabels[i], text=str(self.world.tasks[i].order))
-                self.canvas.itemconfig(self.taskTimeLabels[i], text=str(self.world.tasks[i].timeLeft))
+                self.set_text(self.taskOrderLabels[i], str(self.world.tasks[i].order))
+                self.set_text(self.taskTimeLabels[i], str(self.world.tasks[i].timeLeft))
+
+    def refresh(self):
+        """
+        Draw a frame and process the window events, at most fps times per second. The simulation can run
+        several time steps per frame, the status bar then shows the state of the last one.
+        :return: boolean frame drawn
+        """
+        now = default_timer()
+        if self.fps and self.lastFrame is not None and now - self.lastFrame < 1.0 / self.fps:
+            return False
+        self.lastFrame = now
+        if self.movedRobots:
+            self.draw_robot_moves()
+        if self.statusBarChanged:
+            self.draw_status_bar()
+            self.statusBarChanged = False
+        self.root_window.update_idletasks()
+        self.root_window.update()
+        return True
+
+    def on_layout_changed(self):
+        """
+        Redraw the grid world with the new wall layout
+        """
+        self.layout = self.world.layout
+        self.canvas.delete("all")
+        self.itemTexts = {}
+        self.draw_walls()
+        self.draw_grids()
+        self.draw_stations()
+        self.canvas.pack()
+        self.canvas.update()
+
+    def on_robot_added(self, robot):
+        """
+        Draw a newly added robot
+        :param robot:
+        """
+        x, y = robot.pos
+        tag = "robot" + str(robot.index)
+        id_shape = self.canvas.create_oval(x * self.gridSize, y * self.gridSize, (x + 1) * self.gridSize, (y + 1) * self.gridSize, fill="green", tag=tag)
+        id_text = self.canvas.create_text((x + 0.5) * self.gridSize, (y + 0.5) * self.gridSize, fill="black", text=robot.index, tag=tag)
+        self.robotItems[robot] = (id_shape, id_text)
+        self.drawnPos[robot] = [x, y]
+
+    def on_robot_moved(self, robot, direction):
+        """
+        Queue the movement of a robot, the moves of all robots are drawn together with the next frame
+        :param robot:
+        :param direction:
+        """
+        if util.GRAPHICS_ON:
+            self.movedRobots.add(robot)
+
+    def draw_robot_moves(self):
+        """
+        Move every robot that moved since the last frame from the cell it is drawn at to its cell, with one
+        repaint per intermediate frame for the whole fleet
+        """
+        moves = []
+        for robot in self.movedRobots:
+            old = self.drawnPos[robot]
+            if old != robot.pos:
+                moves.append((robot, old, robot.pos[:]))
+        self.movedRobots = set()
+
+        for k in range(1, self.interpolation + 1):
+            fraction = float(k) / (self.interpolation + 1)
+            for robot, old, new in moves:
+                self.place_robot(robot, old[0] + (new[0] - old[0]) * fraction, old[1] + (new[1] - old[1]) * fraction)
+            self.canvas.update()
+        for robot, old, new in moves:
+            self.place_robot(robot, new[0], new[1])
+            self.drawnPos[robot] = new
+
+    def place_robot(self, robot, x, y):
+        """
+        Draw a robot at a cell, x and y may be fractional while it is moving
+        :param robot:
+        :param x:
+        :param y:
+        """
+        id_shape, id_text = self.robotItems[robot]
+        self.canvas.coords(id_shape, x * self.gridSize, y * self.gridSize, (x + 1) * self.gridSize, (y + 1) * self.gridSize)
+        self.canvas.coords(id_text, (x + 0.5) * self.gridSize, (y + 0.5) * self.gridSize)
+
+    def on_task_added(self, task):
+        """
+        Draw a newly added task
+        :param task:
+        """
+        x, y = task.pos
+        margin = 0.5 * (self.gridSize - task.size)
+        id_shape = self.canvas.create_oval(x * self.gridSize + margin, y * self.gridSize + margin, (x + 1) * self.gridSize - margin, (y + 1) * self.gridSize - margin, fill="gray30")
+        id_text = self.canvas.create_text((x + 0.5) * self.gridSize, (y + 0.5) * self.gridSize, fill="white", text=task.index)
+        self.taskItems[task] = (id_shape, id_text)
+
+    def on_task_removed(self, task):
+        """
+        Erase a completed task
+        :param task:
+        """
+        if task in self.taskItems:
+            for obj in self.taskItems.pop(task):
+                self.canvas.delete(obj)
+
+    def on_task_assigned(self, task):
+        """
+        Recolor a task according to its assign status
+        :param task:
+        """
+        if task not in self.taskItems:
+            return
+        id_shape, id_text = self.taskItems[task]
+        if task.assigned:
+            self.canvas.itemconfig(id_shape, fill="red4")
+            self.canvas.itemconfig(id_text, fill="green")
+        else:
+            self.canvas.itemconfig(id_text, fill="white")
 
     def exit_handler(self):
         """
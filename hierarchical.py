@@ -0,0 +1,294 @@
+from heapq import heappush, heappop
+from layout import DIRECTIONS
+from search import PathCache
+import util
+
+# Width and height of a cluster in cells
+CLUSTER_SIZE = 10
+# Entrances at least this long get a transition at both ends, shorter ones a transition on every cell, so the paths
+# can take either lane of an aisle
+ENTRANCE_SPLIT = 6
+# Floors with fewer cells are left to A*, whose goal heuristic is exact there (see distance.HEURISTIC_ROW_LIMIT)
+MIN_CELLS = 20000
+
+INF = float('inf')
+
+
+class ClusterGraph():
+    """
+    Abstract graph of a layout for hierarchical path finding (HPA*). The floor is cut into square clusters, the
+    free cells on both sides of a cluster border are the entrance nodes, linked across the border by a single move
+    and to the other entrances of their cluster by the shortest path inside the cluster. The paths inside a cluster
+    are kept as Dijkstra trees, computed the first time a search reaches the cluster.
+    """
+
+    def __init__(self, grid_cost, cols, rows, size=CLUSTER_SIZE):
+        """
+        :param grid_cost: GridCost of the layout
+        :param cols: width of the floor in cells
+        :param rows: height of the floor in cells
+        :param size: cluster width and height in cells
+        """
+        self.gridCost = grid_cost
+        self.cols = cols
+        self.rows = rows
+        self.size = size
+        self.nodes = {}  # cluster: (list) entrance cells
+        self.inter = {}  # entrance cell: (list)(cell, cost) of the moves across the border
+        self.intra = {}  # entrance cell: (list)(cell, cost) of the paths to the entrances of its cluster
+        self.trees = {}  # entrance cell: (dict) cell: previous cell of the paths from the entrance in its cluster
+        self.built = set()  # clusters with their intra-cluster paths
+        self.expansions = 0
+        self.build_entrances()
+
+    def cluster_of(self, cell):
+        return cell[0] // self.size, cell[1] // self.size
+
+    def is_free(self, cell):
+        return self.gridCost.get((cell[0], cell[1], cell[0] + 1, cell[1])) is not None
+
+    def cost(self, cell1, cell2):
+        """
+        Cost of the move from cell1 to its neighbour cell2, inf if it is not allowed
+        """
+        cost = self.gridCost.get(cell1 + cell2)
+        return INF if cost is None or not self.is_free(cell2) else cost
+
+    def build_entrances(self):
+        """
+        Find the entrances along every cluster border and place their transitions
+        """
+        size = self.size
+        # Vertical borders between the columns x - 1 and x, then horizontal ones between the rows y - 1 and y
+        for x in range(size, self.cols, size):
+            for y0 in range(0, self.rows, size):
+                self.add_entrances([((x - 1, y), (x, y)) for y in range(y0, min(y0 + size, self.rows))])
+        for y in range(size, self.rows, size):
+            for x0 in range(0, self.cols, size):
+                self.add_entrances([((x, y - 1), (x, y)) for x in range(x0, min(x0 + size, self.cols))])
+
+    def add_entrances(self, pairs):
+        """
+        Split a border into entrances, the runs of cell pairs that can be crossed, and add their transitions
+        :param pairs: (list)(cell, cell) along the border
+        """
+        run = []
+        for pair in pairs + [None]:
+            if pair is not None and (self.cost(pair[0], pair[1]) < INF or self.cost(pair[1], pair[0]) < INF):
+                run.append(pair)
+                continue
+            if len(run) >= ENTRANCE_SPLIT:
+                transitions = [run[0], run[-1]]
+            else:
+                transitions = run
+            for cell1, cell2 in transitions:
+                for a, b in [(cell1, cell2), (cell2, cell1)]:
+                    if a not in self.inter:
+                        self.inter[a] = []
+                        self.nodes.setdefault(self.cluster_of(a), []).append(a)
+                    cost = self.cost(a, b)
+                    if cost < INF:
+                        self.inter[a].append((b, cost))
+            run = []
+
+    def search_cluster(self, source, reverse=False):
+        """
+        Dijkstra from source over the cells of its cluster
+        :param source: cell
+        :param reverse: search the costs to source instead of from it
+        :return: (dict) cell: cost, (dict) cell: previous cell from source (next cell towards source if reverse)
+        """
+        grid_cost = self.gridCost
+        size = self.size
+        x0, y0 = self.cluster_of(source)
+        x0, y0 = x0 * size, y0 * size
+        dist = {source: 0}
+        prev = {}
+        frontier = [(0, source)]
+        closed = set()
+        while frontier:
+            cost, cell = heappop(frontier)
+            if cell in closed:
+                continue
+            closed.add(cell)
+            if reverse:
+                # The move from a neighbour back to the cell goes the opposite way, E and W or S and N
+                moves = []
+                for k, (dx, dy) in enumerate(DIRECTIONS):
+                    neighbour = (cell[0] + dx, cell[1] + dy)
+                    back = grid_cost.moves(neighbour[0], neighbour[1])
+                    moves.append((neighbour, back[k ^ 1][1] if back else INF))
+            else:
+                moves = grid_cost.moves(cell[0], cell[1])
+            for neighbour, step in moves:
+                if not (x0 <= neighbour[0] < x0 + size and y0 <= neighbour[1] < y0 + size):
+                    continue
+                if cost + step < dist.get(neighbour, INF):
+                    dist[neighbour] = cost + step
+                    prev[neighbour] = cell
+                    heappush(frontier, (cost + step, neighbour))
+        self.expansions += len(closed)
+        return dist, prev
+
+    def build_cluster(self, cluster):
+        """
+        Compute the paths between the entrances of a cluster
+        :param cluster:
+        """
+        self.built.add(cluster)
+        nodes = self.nodes.get(cluster, [])
+        for node in nodes:
+            dist, self.trees[node] = self.search_cluster(node)
+            self.intra[node] = [(other, dist[other]) for other in nodes if other != node and other in dist]
+
+    def trace(self, prev, source, cell):
+        """
+        Return the cells of a tree path from source to cell
+        """
+        cells = [cell]
+        while cell != source:
+            cell = prev[cell]
+            cells.append(cell)
+        cells.reverse()
+        return cells
+
+    def find_path(self, start, goal):
+        """
+        A* over the entrances, with start and goal linked to the entrances of their clusters, followed by the
+        refinement of the abstract path into cells
+        :param start: (tuple)position
+        :param goal: (tuple)position
+        :return: (list)(tuple)position from start to goal, None if goal cannot be reached
+        """
+        if not self.is_free(start) or not self.is_free(goal):
+            return None
+        if start == goal:
+            return [start]
+        start_dist, start_prev = self.search_cluster(start)
+        goal_dist, goal_next = self.search_cluster(goal, reverse=True)
+        goal_cluster = self.cluster_of(goal)
+
+        def successors(cell):
+            if cell == start:
+                edges = [(node, start_dist[node], 'start') for node in self.nodes.get(self.cluster_of(start), [])
+                         if node in start_dist and node != start]
+                if goal in start_dist:
+                    edges.append((goal, start_dist[goal], 'start'))
+                if cell not in self.inter:
+                    return edges
+            else:
+                edges = []
+            cluster = self.cluster_of(cell)
+            if cluster not in self.built:
+                self.build_cluster(cluster)
+            edges.extend((node, cost, 'inter') for node, cost in self.inter[cell])
+            edges.extend((node, cost, 'intra') for node, cost in self.intra[cell])
+            if cluster == goal_cluster and cell in goal_dist:
+                edges.append((goal, goal_dist[cell], 'goal'))
+            return edges
+
+        came_from = {start: None}
+        cost_so_far = {start: 0}
+        frontier = [(util.calculate_manhattan_distance(start, goal), 0, start)]
+        push_count = 1
+        closed = set()
+        while frontier:
+            f, order, cell = heappop(frontier)
+            if cell in closed:
+                continue
+            closed.add(cell)
+            if cell == goal:
+                break
+            for node, cost, kind in successors(cell):
+                new_cost = cost_so_far[cell] + cost
+                if node not in closed and new_cost < cost_so_far.get(node, INF):
+                    cost_so_far[node] = new_cost
+                    came_from[node] = (cell, kind)
+                    heappush(frontier, (new_cost + util.calculate_manhattan_distance(node, goal), push_count, node))
+                    push_count += 1
+        self.expansions += len(closed)
+        if goal not in came_from:
+            return None
+
+        # Refinement of the abstract path, edge by edge from the goal back to the start
+        cells = [goal]
+        node = goal
+        while came_from[node] is not None:
+            previous, kind = came_from[node]
+            if kind == 'inter':
+                segment = [previous, node]
+            elif kind == 'intra':
+                segment = self.trace(self.trees[previous], previous, node)
+            elif kind == 'start':
+                segment = self.trace(start_prev, start, node)
+            else:
+                segment = self.trace(goal_next, goal, previous)[::-1]
+            cells[:0] = segment[:-1]
+            node = previous
+        return cells
+
+
+class HierarchicalPlanner():
+    """
+    Plans the robots of a world on the cluster graph of its layout, so a long trip expands a few entrances
+    instead of every cell on the way. Only floors of at least MIN_CELLS cells are planned this way, smaller ones
+    are left to A*, and so are trips within a cluster and its neighbours, which are short. The paths only avoid
+    walls, PathFind uses them when no robot blocks them. They are not always optimal: on generated floors with
+    counterflow costs they cost at most 1.5 times as much as the optimum and a few percent more on average.
+    """
+
+    def __init__(self, world):
+        self.world = world
+        self.graph = None
+        self.paths = PathCache()  # (start, goal): cells, the graph does not change so neither do its paths
+
+    def precompute(self):
+        """
+        Build the cluster graph and the paths inside every cluster ahead of time
+        """
+        graph = self.get_graph()
+        for cluster in graph.nodes.keys():
+            if cluster not in graph.built:
+                graph.build_cluster(cluster)
+
+    def get_graph(self):
+        if self.graph is None:
+            world = self.world
+            self.graph = ClusterGraph(world.gridCost, world.width / world.gridSize, world.height / world.gridSize)
+        return self.graph
+
+    def is_used(self):
+        """
+        Whether the floor is large enough for hierarchical paths
+        :return: boolean
+        """
+        world = self.world
+        return (world.width / world.gridSize) * (world.height / world.gridSize) >= MIN_CELLS
+
+    def plan(self, robot):
+        """
+        Return the path of the robot to its current task
+        :param robot:
+        :return: abs_path, dir_path or None if the trip is left to A* or the task cannot be reached
+        """
+        if not robot.task or not self.is_used():
+            return None
+        world = self.world
+        graph = self.get_graph()
+        start = (robot.pos[0], robot.pos[1])
+        goal = (robot.task[0].pos[0], robot.task[0].pos[1])
+        (x1, y1), (x2, y2) = graph.cluster_of(start), graph.cluster_of(goal)
+        if abs(x1 - x2) <= 1 and abs(y1 - y2) <= 1:
+            return None
+        cells = self.paths.get((start, goal))
+        if cells is None:
+            expansions = graph.expansions
+            cells = graph.find_path(start, goal)
+            world.metrics.count('searches')
+            world.metrics.count('expansions', graph.expansions - expansions)
+            if cells is None:
+                return None
+            self.paths.put((start, goal), cells)
+        path = [list(cell) for cell in cells]
+        dir_path = [[path[k + 1][0] - path[k][0], path[k + 1][1] - path[k][1]] for k in range(len(path) - 1)]
+        return path, dir_path
@@ -0,0 +1,220 @@
+from heapq import heappush, heappop
+import util
+
+INF = float('inf')
+# Search trees kept per robot, so a robot going back and forth between a task and its station reuses both trees
+TREES_PER_ROBOT = 2
+
+
+class DStarLite():
+    """
+    D* Lite search of one robot towards one goal. The search runs backwards from the goal, so its tree stays
+    valid while the robot moves, and cells blocked or freed by other robots only repair the vertices next to them.
+    """
+
+    def __init__(self, successors, predecessors, goal, start):
+        """
+        :param successors: (dict)(tuple)position: (list)(position, cost) of the moves out of a free cell
+        :param predecessors: (dict)(tuple)position: (list)(position, cost) of the moves into a free cell
+        :param goal: (tuple)position
+        :param start: (tuple)position of the robot
+        """
+        self.successors = successors
+        self.predecessors = predecessors
+        self.goal = goal
+        self.last = start
+        self.km = 0
+        self.g = {}
+        self.rhs = {goal: 0}
+        self.queue = []  # (key, cell), outdated entries are skipped
+        self.queued = {}  # cell: key of its entry in self.queue
+        self.blocked = set()
+        self.expansions = 0
+        self.push(goal, (util.calculate_manhattan_distance(start, goal), 0))
+
+    def push(self, cell, key):
+        self.queued[cell] = key
+        heappush(self.queue, (key, cell))
+
+    def top_key(self):
+        """
+        Return the smallest key in the queue, dropping outdated entries
+        :return: key
+        """
+        while self.queue:
+            key, cell = self.queue[0]
+            if self.queued.get(cell) == key:
+                return key
+            heappop(self.queue)
+        return INF, INF
+
+    def calculate_key(self, cell, start):
+        m = min(self.g.get(cell, INF), self.rhs.get(cell, INF))
+        return m + util.calculate_manhattan_distance(start, cell) + self.km, m
+
+    def best_successor(self, cell):
+        """
+        Return the cheapest way to the goal through a neighbour of cell that is not blocked
+        :param cell:
+        :return: cost, neighbour
+        """
+        best, best_cell = INF, None
+        g = self.g
+        for neighbour, cost in self.successors.get(cell, ()):
+            if neighbour in self.blocked:
+                continue
+            cost += g.get(neighbour, INF)
+            if cost < best:
+                best, best_cell = cost, neighbour
+        return best, best_cell
+
+    def update_vertex(self, cell, start):
+        """
+        Recompute the one step lookahead cost of a cell and queue it if it is inconsistent
+        :param cell:
+        :param start:
+        """
+        if cell != self.goal:
+            best = self.best_successor(cell)[0]
+            if best == INF:
+                self.rhs.pop(cell, None)
+            else:
+                self.rhs[cell] = best
+        self.queued.pop(cell, None)
+        if self.g.get(cell, INF) != self.rhs.get(cell, INF):
+            self.push(cell, self.calculate_key(cell, start))
+
+    def update_predecessors(self, cell, start):
+        """
+        Update the free cells that can move into cell
+        :param cell:
+        :param start:
+        """
+        for neighbour, cost in self.predecessors.get(cell, ()):
+            self.update_vertex(neighbour, start)
+
+    def set_blocked(self, blocked, start):
+        """
+        Replace the cells blocked by robots and repair the vertices whose costs changed
+        :param blocked: (set)(tuple)position
+        :param start:
+        """
+        changed = self.blocked ^ blocked
+        self.blocked = blocked
+        for cell in changed:
+            self.update_predecessors(cell, start)
+
+    def compute_shortest_path(self, start):
+        """
+        Expand inconsistent vertices until the cost of start is known
+        :param start:
+        """
+        while True:
+            top = self.top_key()
+            if top == (INF, INF):
+                return
+            if not (top < self.calculate_key(start, start) or
+                    self.rhs.get(start, INF) != self.g.get(start, INF)):
+                return
+            key, cell = heappop(self.queue)
+            del self.queued[cell]
+            self.expansions += 1
+            new_key = self.calculate_key(cell, start)
+            g, rhs = self.g.get(cell, INF), self.rhs.get(cell, INF)
+            if key < new_key:
+                self.push(cell, new_key)
+            elif g > rhs:
+                self.g[cell] = rhs
+                self.update_predecessors(cell, start)
+            else:
+                self.g.pop(cell, None)
+                self.update_vertex(cell, start)
+                self.update_predecessors(cell, start)
+
+    def replan(self, start, blocked):
+        """
+        Bring the tree up to date with the robot position and the blocked cells and return the path to the goal
+        :param start: (tuple)position of the robot
+        :param blocked: (set)(tuple)position blocked by other robots
+        :return: abs_path, dir_path or None if the goal cannot be reached
+        """
+        if start != self.last:
+            self.km += util.calculate_manhattan_distance(self.last, start)
+            self.last = start
+        self.set_blocked(blocked, start)
+        self.compute_shortest_path(start)
+        if self.g.get(start, INF) == INF and start != self.goal:
+            return None
+
+        cell = start
+        path = [list(start)]
+        dir_path = []
+        while cell != self.goal:
+            best, best_cell = self.best_successor(cell)
+            if best_cell is None or len(path) > len(self.g):
+                return None
+            dir_path.append([best_cell[0] - cell[0], best_cell[1] - cell[1]])
+            path.append(list(best_cell))
+            cell = best_cell
+        return path, dir_path
+
+
+class IncrementalPlanner():
+    """
+    Keeps a D* Lite tree per robot and goal across calls of update_path_finder, so a replan only repairs what
+    changed since the robot's last plan instead of searching the floor again
+    """
+
+    def __init__(self, world):
+        self.world = world
+        self.searches = {}  # robot: (list)DStarLite, the most recently used last
+        self.successors = None
+        self.predecessors = None
+
+    def build(self):
+        """
+        Build the cell keyed moves of the layout shared by every search tree, from the distance oracle adjacency
+        """
+        oracle = self.world.distanceOracle
+        if oracle.cells is None:
+            oracle.build()
+        cells = oracle.cells
+        self.successors = dict((cell, [(cells[j], cost) for j, cost in oracle.successors[i]])
+                               for i, cell in enumerate(cells))
+        self.predecessors = dict((cell, [(cells[j], cost) for j, cost in oracle.predecessors[i]])
+                                 for i, cell in enumerate(cells))
+
+    def plan(self, robot):
+        """
+        Return the path of the robot to its current task
+        :param robot:
+        :return: abs_path, dir_path or None if the goal cannot be reached
+        """
+        if not robot.task:
+            return None
+        start = (robot.pos[0], robot.pos[1])
+        goal = (robot.task[0].pos[0], robot.task[0].pos[1])
+        searches = self.searches.setdefault(robot, [])
+        for search in searches:
+            if search.goal == goal:
+                searches.remove(search)
+                break
+        else:
+            if self.successors is None:
+                self.build()
+            search = DStarLite(self.successors, self.predecessors, goal, start)
+            if len(searches) >= TREES_PER_ROBOT:
+                searches.pop(0)
+        searches.append(search)
+
+        # Like Actions.get_possible_actions, other robots only block moves outside mode 1
+        if self.world.mode == 1:
+            blocked = set()
+        else:
+            blocked = set(self.world.occupancy.robots)
+            blocked.discard(start)
+        expansions = search.expansions
+        result = search.replan(start, blocked)
+        self.world.metrics.count('searches')
+        self.world.metrics.count('expansions', search.expansions - expansions)
+        return result
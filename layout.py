@@ -1,202 +1,276 @@
 from station import Station
 import util
+import numpy
+
+# Direction order of the cost arrays, the same as the E, W, S, N entries of grid_cost
+E, W, S, N = 0, 1, 2, 3
+DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+DIRECTION_INDEX = dict((d, i) for i, d in enumerate(DIRECTIONS))
+
+
+class GridCost():
+    """
+    Read-only dict view of the per-direction edge costs of a layout, keyed by (x1, y1, x2, y2) like the plain
+    grid_cost dict. Only moves out of free cells are present, a move into a wall costs inf.
+    """
+
+    def __init__(self, walls, cost):
+        """
+        :param walls: (numpy array) wall mask of the cells that have costs, indexed [x, y]
+        :param cost: (numpy array) cost[direction, x, y] of moving out of (x, y)
+        """
+        self.walls = walls
+        self.cost = cost
+        self.cols, self.rows = walls.shape
+
+    def get(self, key, default=None):
+        x1, y1, x2, y2 = key
+        d = DIRECTION_INDEX.get((x2 - x1, y2 - y1))
+        if d is None or not (0 <= x1 < self.cols and 0 <= y1 < self.rows) or self.walls.item(x1, y1):
+            return default
+        return self.cost.item(d, x1, y1)
+
+    def moves(self, x, y):
+        """
+        Return the moves out of a cell in E, W, S, N order
+        :param x:
+        :param y:
+        :return: (list)((x, y), cost) of the neighbours, empty for walls and cells off the floor
+        """
+        if not (0 <= x < self.cols and 0 <= y < self.rows) or self.walls.item(x, y):
+            return []
+        cost = self.cost
+        return [((x + 1, y), cost.item(E, x, y)), ((x - 1, y), cost.item(W, x, y)),
+                ((x, y + 1), cost.item(S, x, y)), ((x, y - 1), cost.item(N, x, y))]
+
+    def __getitem__(self, key):
+        cost = self.get(key)
+        if cost is None:
+            raise KeyError(key)
+        return cost
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return 4 * int((self.walls == 0).sum())
+
+    def iteritems(self):
+        xs, ys = numpy.nonzero(self.walls == 0)
+        for x, y in zip(xs.tolist(), ys.tolist()):
+            for d, (dx, dy) in enumerate(DIRECTIONS):
+                yield (x, y, x + dx, y + dy), self.cost.item(d, x, y)
+
+    def __iter__(self):
+        for key, cost in self.iteritems():
+            yield key
+
+    def items(self):
+        return list(self.iteritems())
+
+    def keys(self):
+        return list(iter(self))
+
+
+class LayoutBuilder():
+    def __init__(self, width, height, grid_size, padding=0):
+        """
+        Start an empty floor of width x height pixels. Walls and costs are kept as NumPy arrays indexed [x, y].
+        :param width:
+        :param height:
+        :param grid_size:
+        :param padding: extra free columns and rows allocated past the floor
+        """
+        self.width = width
+        self.height = height
+        self.gridSize = grid_size
+        self.cols = width / grid_size
+        self.rows = height / grid_size
+        self.walls = numpy.zeros((self.cols + padding, self.rows + padding), dtype=numpy.int8)
+        self.stations = []
+        self.rules = []
+
+    def add_border(self):
+        """
+        Surround the floor with walls
+        """
+        self.walls[[0, self.cols - 1], :self.rows] = 1
+        self.walls[:self.cols, [0, self.rows - 1]] = 1
+
+    def add_racks(self, first, rack_width, pitch, end, rows):
+        """
+        Add rack columns of rack_width cells every pitch cells, from column first up to column end
+        :param first: first rack column
+        :param rack_width:
+        :param pitch: distance between the first columns of two neighbouring racks
+        :param end: racks do not start at or past this column
+        :param rows: (slice) rows covered by the racks
+        """
+        for x in range(first, end, pitch):
+            self.walls[x:x + rack_width, rows] = 1
+
+    def clear(self, cols, rows):
+        """
+        Remove the walls in a block of cells
+        :param cols: (slice)
+        :param rows: (slice)
+        """
+        self.walls[cols, rows] = 0
+
+    def add_station(self, pos):
+        """
+        Add a station, its cell is always free
+        :param pos:
+        """
+        self.stations.append(Station(pos))
+
+    def set_cost(self, direction, cols, rows, cost):
+        """
+        Change the cost of the open moves in one direction inside a block of cells, applied on build.
+        Moves into walls keep their inf cost.
+        :param direction: E, W, S or N
+        :param cols: (slice)
+        :param rows: (slice)
+        :param cost: inf for one-way rules, a finite value to discourage a direction
+        """
+        self.rules.append((direction, cols, rows, cost))
+
+    def build(self):
+        """
+        Compute the edge costs and return the layout in the get_layout format
+        :return: width, height, grid_size, wall_layout, stations, grid_cost
+        """
+        for s in self.stations:
+            x, y = s.pos
+            self.walls[x, y] = 0
+
+        # Cells outside the array count as walls
+        padded = numpy.pad(self.walls, 1, 'constant', constant_values=1)
+        cost = numpy.empty((4, self.cols, self.rows))
+        for d, (dx, dy) in enumerate(DIRECTIONS):
+            neighbour = padded[1 + dx:1 + dx + self.cols, 1 + dy:1 + dy + self.rows]
+            cost[d] = numpy.where(neighbour == 0, 1.0, float('inf'))
+
+        for direction, cols, rows, value in self.rules:
+            block = cost[direction, cols, rows]
+            block[block == 1] = value
+
+        grid_cost = GridCost(self.walls[:self.cols, :self.rows], cost)
+        return self.width, self.height, self.gridSize, self.walls.tolist(), self.stations, grid_cost
+
+
+def generate_layout(cols, rows, grid_size=20, rack_width=2, aisle_width=2, cross_aisle_spacing=8,
+                    cross_aisle_width=2, stations=None, one_way=True, counterflow_cost=None):
+    """
+    Generate a warehouse floor of rack columns separated by aisles and broken by cross-aisles.
+    Row 1 is a lane along the top wall that holds the stations. The default station is util.START_POINT, where
+    mode 10 dispatches the robots from, or the east end of the lane on floors too narrow for it.
+    :param cols: number of cells across
+    :param rows: number of cells down
+    :param grid_size: cell size in pixels
+    :param rack_width: cells per rack column
+    :param aisle_width: cells per aisle between two racks
+    :param cross_aisle_spacing: rows from one cross-aisle to the next, the first one starts at row 2
+    :param cross_aisle_width: rows per cross-aisle
+    :param stations: (list)position of free cells inside the border, defaults to util.START_POINT
+    :param one_way: the top lane can only be driven eastwards
+    :param counterflow_cost: if set, the west lane of every aisle runs north and the east lane south,
+                             the first row of every cross-aisle runs east and the last row west,
+                             and moving against the flow costs counterflow_cost
+    :return: width, height, grid_size, wall_layout, stations, grid_cost
+    """
+    if cols < 3 or rows < 3:
+        raise ValueError('a floor of %dx%d cells has no room inside its border, at least 3x3 cells are needed'
+                         % (cols, rows))
+    builder = LayoutBuilder(cols * grid_size, rows * grid_size, grid_size)
+    builder.add_border()
+    pitch = rack_width + aisle_width
+    builder.add_racks(1 + aisle_width, rack_width, pitch, cols - 1 - rack_width, slice(1, rows))
+    builder.clear(slice(1, cols - 1), slice(1, 2))
+    for y in range(2, rows - 1, cross_aisle_spacing):
+        builder.clear(slice(1, cols - 1), slice(y, min(y + cross_aisle_width, rows - 1)))
+
+    if stations is None:
+        stations = [[min(util.START_POINT[0], cols - 2), 1]]
+    for pos in stations:
+        x, y = pos
+        if not (0 < x < cols - 1 and 0 < y < rows - 1):
+            raise ValueError('station %s is outside the %dx%d floor' % (pos, cols, rows))
+        if builder.walls[x, y]:
+            raise ValueError('station %s is on a wall' % (pos,))
+        builder.add_station(pos)
+
+    if one_way:
+        builder.set_cost(W, slice(0, cols), slice(1, 2), float('inf'))
+    if counterflow_cost is not None:
+        if aisle_width > 1:
+            builder.set_cost(S, slice(1, cols - 1, pitch), slice(1, rows), counterflow_cost)
+            builder.set_cost(N, slice(aisle_width, cols - 1, pitch), slice(1, rows), counterflow_cost)
+        if cross_aisle_width > 1:
+            builder.set_cost(W, slice(1, cols), slice(2, rows - 1, cross_aisle_spacing), counterflow_cost)
+            builder.set_cost(E, slice(1, cols), slice(1 + cross_aisle_width, rows - 1, cross_aisle_spacing),
+                             counterflow_cost)
+
+    return builder.build()
 
 
 def get_layout1():
-    width, height, grid_size = 1000, 1000, 50
-    wall_layout = [[0 for row in range(0, height / grid_size + 1)] for col in range(0, width / grid_size + 1)]
-    for x in range(0, width / grid_size):
-        for y in range(0, height / grid_size):
-            if x == 0 or y == 0 or x == width / grid_size - 1 or y == height / grid_size - 1:
-                wall_layout[x][y] = 1
+    builder = LayoutBuilder(1000, 1000, 50, padding=1)
+    builder.add_border()
 
-    stations = []
-
-    for i in range(width / (2 * grid_size) - 2, width / (2 * grid_size) + 2):
+    for i in range(builder.cols / 2 - 2, builder.cols / 2 + 2):
         for j in range(1, 3):
-            stations.append(Station([i, j]))
-
-    grid_cost = dict()
-    for x in range(0, width / grid_size):
-        for y in range(0, height / grid_size):
-            if wall_layout[x][y] == 0:
-                E = 1 if wall_layout[x + 1][y] == 0 else float('inf')
-                W = 1 if wall_layout[x - 1][y] == 0 else float('inf')
-                S = 1 if wall_layout[x][y + 1] == 0 else float('inf')
-                N = 1 if wall_layout[x][y - 1] == 0 else float('inf')
-                grid_cost[x, y, x + 1, y] = E
-                grid_cost[x, y, x - 1, y] = W
-                grid_cost[x, y, x, y + 1] = S
-                grid_cost[x, y, x, y - 1] = N
+            builder.add_station([i, j])
 
-    return width, height, grid_size, wall_layout, stations, grid_cost
+    return builder.build()
 
 
 def get_layout2():
-    width, height, grid_size = 1180, 980, 20
-    wall_layout = [[0 for row in range(0, height / grid_size)] for col in range(0, width / grid_size)]
-    for x in range(0, width / grid_size):
-        for y in range(0, height / grid_size):
-            if x in {0, 0, width / grid_size - 1, width / grid_size - 1} or y in {0, 0, height / grid_size - 1,
-                                                                                  height / grid_size - 1}:
-                wall_layout[x][y] = 1
-
-    for i in range(1, width / (3 * grid_size) - 1):
-        for j in range(1, height / grid_size):
-            if i % 2:
-                wall_layout[3 * i + 1][j] = 1
-                wall_layout[3 * i + 2][j] = 1
-                wall_layout[3 * i + 3][j] = 1
-
-    for m in range(1, width / grid_size - 2):
-        for n in range(1, height / grid_size - 1, 7):
-            wall_layout[m][n] = 0
-            wall_layout[m + 1][n] = 0
-            wall_layout[m][n + 1] = 0
-            wall_layout[m][n + 2] = 0
-            wall_layout[m + 1][n + 1] = 0
-
-    stations = [Station(util.START_POINT[:])]
-
-    # for p in range(1, width / grid_size - 2):
-    #     if not (p + 1) % 6:
-    #         stations.append(Station([p, 1]))
-    #         stations.append(Station([p, height / grid_size - 2]))
-
-    for s in stations:
-        x, y = s.pos
-        wall_layout[x][y] = 0
-
-    grid_cost = dict()
-    for x in range(0, width / grid_size):
-        for y in range(0, height / grid_size):
-            if wall_layout[x][y] == 0:
-                E = 1 if wall_layout[x + 1][y] == 0 else float('inf')
-                W = 1 if wall_layout[x - 1][y] == 0 else float('inf')
-                S = 1 if wall_layout[x][y + 1] == 0 else float('inf')
-                N = 1 if wall_layout[x][y - 1] == 0 else float('inf')
-                grid_cost[x, y, x + 1, y] = E
-                grid_cost[x, y, x - 1, y] = W
-                grid_cost[x, y, x, y + 1] = S
-                grid_cost[x, y, x, y - 1] = N
-
-    for x in range(0, width / grid_size):
-        if (x, 1, x - 1, 1) in grid_cost:
-            grid_cost[x, 1, x - 1, 1] = float('inf')
-
-    return width, height, grid_size, wall_layout, stations, grid_cost
+    builder = LayoutBuilder(1180, 980, 20)
+    cols, rows = builder.cols, builder.rows
+    builder.add_border()
+    builder.add_racks(4, 3, 6, 3 * (cols / 3 - 1) + 1, slice(1, rows))
+    for n in range(1, rows - 1, 7):
+        builder.clear(slice(1, cols - 1), slice(n, n + 3))
+
+    builder.add_station(util.START_POINT[:])
+    builder.set_cost(W, slice(0, cols), slice(1, 2), float('inf'))
+
+    return builder.build()
 
 
 def get_layout3():
-    width, height, grid_size = 820, 620, 20
-    wall_layout = [[0 for row in range(0, height / grid_size + 1)] for col in range(0, width / grid_size + 1)]
-    for x in range(0, width / grid_size):
-        for y in range(0, height / grid_size):
-            if x in {0, 0, width / grid_size, width / grid_size - 1} or y in {0, 0, height / grid_size - 1,
-                                                                              height / grid_size - 1}:
-                wall_layout[x][y] = 1
-
-    for i in range(1, width / (3 * grid_size) - 1):
-        for j in range(1, height / grid_size):
-            if i % 2:
-                wall_layout[3 * i + 1][j] = 1
-                wall_layout[3 * i + 2][j] = 1
-                wall_layout[3 * i + 3][j] = 1
-
-    for m in range(2, width / grid_size - 2):
-        for n in range(2, height / grid_size - 1, 8):
-            wall_layout[m][n] = 0
-            wall_layout[m + 1][n] = 0
-            wall_layout[m][n + 1] = 0
-            wall_layout[m][n + 2] = 0
-            wall_layout[m + 1][n + 1] = 0
-
-    stations = []
-
-    for p in range(1, width / grid_size - 2):
-        if not (p + 1) % 6:
-            stations.append(Station([p, 1]))
-            stations.append(Station([p, height / grid_size - 2]))
-
-    for s in stations:
-        x, y = s.pos
-        wall_layout[x][y] = 0
-
-    grid_cost = dict()
-    for x in range(0, width / grid_size):
-        for y in range(0, height / grid_size):
-            if wall_layout[x][y] == 0:
-                E = 1 if wall_layout[x + 1][y] == 0 else float('inf')
-                W = 1 if wall_layout[x - 1][y] == 0 else float('inf')
-                S = 1 if wall_layout[x][y + 1] == 0 else float('inf')
-                N = 1 if wall_layout[x][y - 1] == 0 else float('inf')
-                grid_cost[x, y, x + 1, y] = E
-                grid_cost[x, y, x - 1, y] = W
-                grid_cost[x, y, x, y + 1] = S
-                grid_cost[x, y, x, y - 1] = N
-
-    return width, height, grid_size, wall_layout, stations, grid_cost
+    builder = LayoutBuilder(820, 620, 20, padding=1)
+    cols, rows = builder.cols, builder.rows
+    builder.add_border()
+    builder.add_racks(4, 3, 6, 3 * (cols / 3 - 1) + 1, slice(1, rows))
+    for n in range(2, rows - 1, 8):
+        builder.clear(slice(2, cols - 1), slice(n, n + 3))
+
+    for p in range(5, cols - 2, 6):
+        builder.add_station([p, 1])
+        builder.add_station([p, rows - 2])
+
+    return builder.build()
 
 
 def get_layout4():
-    width, height, grid_size = 800, 580, 20
-    wall_layout = [[0 for row in range(0, height / grid_size)] for col in range(0, width / grid_size)]
-    for x in range(0, width / grid_size):
-        for y in range(0, height / grid_size):
-            if x in {0, 0, width / grid_size - 1, width / grid_size - 1} or y in {0, 0, height / grid_size - 1,
-                                                                                  height / grid_size - 1}:
-                wall_layout[x][y] = 1
-
-    for i in range(1, width / (2 * grid_size) - 1):
-        for j in range(1, height / grid_size):
-            if i % 2:
-                wall_layout[2 * i + 1][j] = 1
-                wall_layout[2 * i + 2][j] = 1
-
-    for m in range(1, width / grid_size - 2):
-        wall_layout[m][1] = 0
-        for n in range(2, height / grid_size - 1, 8):
-            wall_layout[m][n] = 0
-            wall_layout[m][n + 1] = 0
-
-    stations = [Station(util.START_POINT[:])]
-
-    for s in stations:
-        x, y = s.pos
-        wall_layout[x][y] = 0
-
-    grid_cost = dict()
-    for x in range(0, width / grid_size):
-        for y in range(0, height / grid_size):
-            if wall_layout[x][y] == 0:
-                E = 1 if wall_layout[x + 1][y] == 0 else float('inf')
-                W = 1 if wall_layout[x - 1][y] == 0 else float('inf')
-                S = 1 if wall_layout[x][y + 1] == 0 else float('inf')
-                N = 1 if wall_layout[x][y - 1] == 0 else float('inf')
-                grid_cost[x, y, x + 1, y] = E
-                grid_cost[x, y, x - 1, y] = W
-                grid_cost[x, y, x, y + 1] = S
-                grid_cost[x, y, x, y - 1] = N
-
-    for x in range(0, width / grid_size):
-        if (x, 1, x - 1, 1) in grid_cost and grid_cost[x, 1, x - 1, 1] == 1:
-            grid_cost[x, 1, x - 1, 1] = float('inf')
-
-    oppo_dir_cost=3
-    for y in range(1,height/grid_size):
-        for x in range(1,width /grid_size-1,4):
-            if (x, y, x, y+1) in grid_cost and grid_cost[x, y, x, y+1] == 1:
-                grid_cost[x, y, x, y+1]=oppo_dir_cost
-        for x in range(2,width / grid_size-1,4):
-            if (x, y, x, y-1) in grid_cost and grid_cost[x, y, x, y-1] == 1:
-                grid_cost[x, y, x, y-1]=oppo_dir_cost
-
-    for x in range(1,width/grid_size):
-        for y in range(2,height/grid_size-1,8):
-            if (x, y, x-1,y) in grid_cost and grid_cost[x, y, x-1,y] ==1:
-                grid_cost[x, y, x-1,y]=oppo_dir_cost
-        for y in range(3,height/grid_size-1,8):
-            if (x, y, x+1,y) in grid_cost and grid_cost[x, y, x+1,y] ==1:
-                grid_cost[x, y, x+1,y]=oppo_dir_cost
-
-    return width, height, grid_size, wall_layout, stations, grid_cost
+    return generate_layout(40, 29, rack_width=2, aisle_width=2, cross_aisle_spacing=8, cross_aisle_width=2,
+                           counterflow_cost=3)
+
+
+# Floors in the style of layout 4 large enough for the hierarchical planner, best run headless
+def get_generated_layout200():
+    return generate_layout(200, 200, counterflow_cost=3)
+
+
+def get_generated_layout500():
+    return generate_layout(500, 500, counterflow_cost=3)
+
+
+LAYOUT_MAP = {'1': get_layout1,
+              '2': get_layout2,
+              '3': get_layout3,
+              '4': get_layout4,
+              'g200': get_generated_layout200,
+              'g500': get_generated_layout500}
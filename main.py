@@ -1,15 +1,12 @@
-from graphics import MainGraphics
-from world import WorldState
-from layout import *
+from simulation import Simulation
+from events import EventSimulation
+from orders import open_order_file
+from layout import LAYOUT_MAP
+from timeit import default_timer
 import util
 import argparse
 import atexit
 
-LAYOUT_MAP = {'1': get_layout1,
-              '2': get_layout2,
-              '3': get_layout3,
-              '4': get_layout4}
-
 parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
 parser.add_argument('-rr', type=int, default=0, help="number of randomized robots")
 parser.add_argument('-fr', type=int, default=20, help="number of fixed robots")
@@ -17,18 +14,33 @@ parser.add_argument('-t', type=int, default=10, help="number of tasks")
 parser.add_argument('-d', type=bool, default=False, help="directional layout")
 parser.add_argument('-l', default='4', choices=sorted(LAYOUT_MAP.keys()), help="layout selection")
 parser.add_argument('-m', type=int, default=10, help="task allocation mode")
-parser.add_argument('-g', type=int, default=1, help="graphics")
+parser.add_argument('-g', type=int, default=1, help="graphics (1: full, 0: partial, -1: headless)")
 parser.add_argument('-st', type=int, default=2000, help="simulation time")
 parser.add_argument('-tr', type=int, default=100, help="task rewards")
 parser.add_argument('-df', type=float, default=0.999, help="discounting factor")
 parser.add_argument('-tpf', type=float, default=5, help="temporal priority factor")
 parser.add_argument('-tg', type=int, default=40, help="task generation time interval")
 parser.add_argument('-rc', type=int, default=10, help="robot capacity")
+parser.add_argument('-pl', default='astar', choices=['astar', 'cooperative', 'dstar', 'hpa'], help="path planner")
+parser.add_argument('-ev', type=int, default=0, help="discrete-event simulation of mode 10 (1: on, 0: off)")
+parser.add_argument('-of', default=None, help="order log (.csv or .jsonl) the tasks of mode 10 are replayed from")
+parser.add_argument('-os', type=float, default=1, help="order log time units per time step")
+parser.add_argument('-al', default='greedy', choices=['greedy', 'batch'], help="task allocation of mode 1")
+parser.add_argument('-z', type=int, default=0, help="zones of the batch allocation, 0 for none")
+parser.add_argument('-zw', type=int, default=0, help="worker processes the zones are solved in")
+parser.add_argument('-fps', type=int, default=0, help="frames drawn per second at most, 0 for every tick")
+parser.add_argument('-ai', type=int, default=1, help="intermediate animation frames per robot move")
+parser.add_argument('-mf', default=None, help="metrics json file")
+parser.add_argument('-mi', type=int, default=0, help="ticks between two metrics exports, 0 for the end of the run only")
 
 args = parser.parse_args()
+if args.z and (args.m != 1 or args.al != 'batch'):
+    parser.error("zones (-z) only apply to the batch allocation of mode 1 (-m 1 -al batch)")
+if args.zw and not args.z:
+    parser.error("zone workers (-zw) need zones (-z)")
 
 util.INITIAL_TASK = args.t
-util.GRAPHICS_ON = args.g
+util.GRAPHICS_ON = max(args.g, 0)
 util.SIMULATION_TIME = args.st
 util.TASK_REWARD = args.tr
 util.DISCOUNTING_FACTOR = args.df
@@ -36,46 +48,45 @@ util.TEMPORAL_PRIORITY_FACTOR = args.tpf
 util.TASK_TIME_INTERVAL = args.tg
 util.ROBOT_CAPACITY = args.rc
 
-getLayout = LAYOUT_MAP[args.l]
-width, height, gridSize, layout, stations, gridCost = getLayout()
-
-world = WorldState(width=width, height=height, gridSize=gridSize, layout=layout, stations=stations, gridCost=gridCost, directional=args.d, mode=args.m)
-graphics = MainGraphics(world=world)
-world.set_graphics(graphics)
+orders = open_order_file(args.of, time_scale=args.os) if args.of else None
+simulation_class = EventSimulation if args.ev else Simulation
+simulation = simulation_class(layout=args.l, mode=args.m, fixed_robots=args.fr, random_robots=args.rr,
+                              directional=args.d, planner=args.pl, allocator=args.al, orders=orders,
+                              zones=args.z, zone_workers=args.zw)
+world = simulation.world
+if args.mf:
+    world.metrics.set_export(args.mf, args.mi)
+graphics = None
+if args.g >= 0:
+    # Tkinter is only needed when a window is shown
+    from graphics import MainGraphics
+    graphics = MainGraphics(world=world, fps=args.fps, interpolation=args.ai)
+    world.set_graphics(graphics)
 
 
 # Main loop for window
 def setup():
-    if args.rr:
-        world.add_random_robot(args.rr)
-    for i in range(args.fr):
-        world.add_robot(world.stations[0].pos)
-    world.add_random_task(util.INITIAL_TASK)
-
-    if args.m == 0:
-        for i in range(len(world.robots)):
-            if i < len(world.tasks):
-                world.robots[i].add_task(world.tasks[i])
+    simulation.setup()
 
-    graphics.create_robot_status_bar()
+    if graphics:
+        graphics.create_robot_status_bar()
 
-    if args.m != 10:
-        graphics.create_task_status_bar()
+        if args.m != 10:
+            graphics.create_task_status_bar()
 
 
 setup()
 
-while True:
-    if world.timer % util.TASK_TIME_INTERVAL == 0 and world.mode == 10:
-        world.add_random_task(14)
-    world.update()
-    for robot in world.robots:
-        robot.follow_path()
-    graphics.root_window.after(0)
-    graphics.root_window.update_idletasks()
-    graphics.root_window.update()
-    if world.timer == util.SIMULATION_TIME:
-        break
+while not simulation.is_finished():
+    simulation.step()
+    if graphics:
+        start = default_timer()
+        if graphics.refresh():
+            world.metrics.lap('render', start)
+if args.mf:
+    world.metrics.export()
+if world.zoneMap:
+    world.zoneMap.close()
 
 
 def exit_handler():
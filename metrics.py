@@ -0,0 +1,111 @@
+from timeit import default_timer
+import json
+
+
+class Histogram():
+    """
+    Power of two histogram, bucket k counts the values v with int(v).bit_length() == k, so bucket 0 holds 0,
+    bucket 1 holds 1, bucket 2 holds 2 and 3 and so on
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, value):
+        k = int(value).bit_length()
+        self.buckets[k] = self.buckets.get(k, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def to_dict(self):
+        """
+        :return: (dict) summary with the buckets keyed by their exclusive upper bound
+        """
+        return {'count': self.count, 'total': self.total, 'max': self.max,
+                'mean': float(self.total) / self.count if self.count else 0,
+                'histogram': dict(('<%d' % (1 << k), n) for k, n in sorted(self.buckets.items()))}
+
+
+class TickMetrics():
+    """
+    Wall time of every phase of a tick and per tick counts of searches, expansions and allocations.
+    Times are kept in microseconds, every phase and counter costs a dict update per tick, so the
+    instrumentation stays on in every run.
+    """
+
+    def __init__(self):
+        self.phases = {}  # name: Histogram of microseconds per call
+        self.counters = {}  # name: Histogram of counts per tick
+        self.tick = {}  # name: count in the current tick
+        self.ticks = 0
+        self.path = None
+        self.interval = 0
+
+    def set_export(self, path, interval=0):
+        """
+        Write the metrics to a file at the end of the run and, if interval is set, every interval ticks
+        :param path: json file
+        :param interval: ticks between two exports, 0 for the end of the run only
+        """
+        self.path = path
+        self.interval = interval
+
+    def lap(self, name, start):
+        """
+        Record the time of a phase that started at start
+        :param name: phase
+        :param start: default_timer() value at the start of the phase
+        :return: default_timer() value now, the start of the next phase
+        """
+        now = default_timer()
+        histogram = self.phases.get(name)
+        if histogram is None:
+            histogram = self.phases[name] = Histogram()
+        histogram.add(int((now - start) * 1000000))
+        return now
+
+    def count(self, name, value=1):
+        """
+        Add to a counter of the current tick
+        :param name: counter
+        :param value:
+        """
+        self.tick[name] = self.tick.get(name, 0) + value
+
+    def end_tick(self):
+        """
+        Close the current tick, adding its counts to the counter histograms
+        """
+        for name in self.counters:
+            if name not in self.tick:
+                self.counters[name].add(0)
+        for name, value in self.tick.iteritems():
+            histogram = self.counters.get(name)
+            if histogram is None:
+                # Ticks before the first count of a counter had none
+                histogram = self.counters[name] = Histogram()
+                if self.ticks:
+                    histogram.buckets[0] = histogram.count = self.ticks
+            histogram.add(value)
+        self.tick = {}
+        self.ticks += 1
+        if self.path and self.interval and self.ticks % self.interval == 0:
+            self.export()
+
+    def to_dict(self):
+        return {'ticks': self.ticks,
+                'phases': dict((name, h.to_dict()) for name, h in self.phases.iteritems()),
+                'counters': dict((name, h.to_dict()) for name, h in self.counters.iteritems())}
+
+    def export(self, path=None):
+        """
+        Write the metrics collected so far as json
+        :param path: defaults to the path given to set_export
+        """
+        with open(path or self.path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
@@ -0,0 +1,53 @@
+class WorldObserver():
+    """
+    Rendering interface of the world. The world, robots and tasks only talk to the view through these hooks,
+    so the simulation runs headless with this no-op observer and a graphical view is attached on demand.
+    """
+
+    def on_layout_changed(self):
+        """
+        Called when the wall layout of the world is replaced
+        """
+        pass
+
+    def on_robot_added(self, robot):
+        """
+        Called when a robot is added to the world
+        :param robot:
+        """
+        pass
+
+    def on_robot_moved(self, robot, direction):
+        """
+        Called after a robot moved one step
+        :param robot:
+        :param direction:
+        """
+        pass
+
+    def on_task_added(self, task):
+        """
+        Called when a task is added to the world
+        :param task:
+        """
+        pass
+
+    def on_task_removed(self, task):
+        """
+        Called when a completed task is removed from the world
+        :param task:
+        """
+        pass
+
+    def on_task_assigned(self, task):
+        """
+        Called when the assign status of a task changes
+        :param task:
+        """
+        pass
+
+    def update_status_bar(self):
+        """
+        Called once per time step after the world state is updated
+        """
+        pass
@@ -0,0 +1,81 @@
+class OccupancyIndex():
+    """
+    Cell keyed index of the robots, tasks and stations in the world. The world keeps it up to date whenever
+    a robot moves or a task is added or removed, so position lookups do not scan the object lists.
+    """
+
+    def __init__(self, stations):
+        """
+        Initialize the index with the static stations
+        :param stations:
+        """
+        self.robots = {}
+        self.tasks = {}
+        self.stations = {}
+        for station in stations:
+            self.stations.setdefault((station.pos[0], station.pos[1]), station)
+
+    def add_robot(self, robot):
+        """
+        Register a robot at its current position
+        :param robot:
+        """
+        self.robots.setdefault((robot.pos[0], robot.pos[1]), []).append(robot)
+
+    def move_robot(self, robot, old_pos):
+        """
+        Move a robot from old_pos to its current position
+        :param robot:
+        :param old_pos:
+        """
+        cell = (old_pos[0], old_pos[1])
+        robots = self.robots[cell]
+        robots.remove(robot)
+        if not robots:
+            del self.robots[cell]
+        self.add_robot(robot)
+
+    def find_robot(self, pos):
+        """
+        Return the robot at a position, the earliest added one if robots overlap
+        :param pos:
+        :return: robot or 0
+        """
+        robots = self.robots.get((pos[0], pos[1]))
+        if not robots:
+            return 0
+        if len(robots) == 1:
+            return robots[0]
+        return min(robots, key=lambda r: r.index)
+
+    def add_task(self, task):
+        """
+        Register a task at its position
+        :param task:
+        """
+        self.tasks[task.pos[0], task.pos[1]] = task
+
+    def remove_task(self, task):
+        """
+        Unregister a task
+        :param task:
+        """
+        cell = (task.pos[0], task.pos[1])
+        if self.tasks.get(cell) is task:
+            del self.tasks[cell]
+
+    def find_task(self, pos):
+        """
+        Return the task at a position
+        :param pos:
+        :return: task or 0
+        """
+        return self.tasks.get((pos[0], pos[1]), 0)
+
+    def find_station(self, pos):
+        """
+        Return the station at a position
+        :param pos:
+        :return: station or 0
+        """
+        return self.stations.get((pos[0], pos[1]), 0)
@@ -0,0 +1,113 @@
+from collections import deque
+import itertools
+import json
+import csv
+
+# Orders read ahead from a source at most
+ORDER_BUFFER_SIZE = 1024
+
+
+def read_csv_orders(path):
+    """
+    Lazily read an order log with a header row and the columns time, x and y
+    :param path: csv file
+    :return: generator of (time, position)
+    """
+    with open(path, 'rb') as f:
+        for row in csv.DictReader(f):
+            yield float(row['time']), [int(row['x']), int(row['y'])]
+
+
+def read_jsonl_orders(path):
+    """
+    Lazily read an order log with one json object per line, {"time": t, "pos": [x, y]} or {"time": t, "x": x, "y": y}
+    :param path: jsonl file
+    :return: generator of (time, position)
+    """
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            order = json.loads(line)
+            pos = order['pos'] if 'pos' in order else [order['x'], order['y']]
+            yield float(order['time']), [int(pos[0]), int(pos[1])]
+
+
+def open_order_file(path, time_scale=1.0, start=None):
+    """
+    Return an order stream reading a csv or jsonl order log
+    :param path: .csv, .jsonl or .json file
+    :param time_scale: see OrderStream
+    :param start: see OrderStream
+    :return: OrderStream
+    """
+    if path.endswith('.csv'):
+        orders = read_csv_orders(path)
+    elif path.endswith('.jsonl') or path.endswith('.json'):
+        orders = read_jsonl_orders(path)
+    else:
+        raise ValueError('unknown order file format: %s' % path)
+    return OrderStream(orders, time_scale=time_scale, start=start)
+
+
+class OrderStream():
+    """
+    Orders pulled lazily from any iterable of (time, position) in time order, such as a file reader or a Python
+    generator. At most buffer_size orders are read ahead, so a long order history is never held in memory.
+    Order times are mapped to world time steps by (time - start) / time_scale, a time_scale above 1 replays
+    the orders accelerated.
+    """
+
+    def __init__(self, orders, time_scale=1.0, start=None, buffer_size=ORDER_BUFFER_SIZE):
+        """
+        :param orders: iterable of (time, position)
+        :param time_scale: order time units per time step
+        :param start: order time of time step 0, defaults to the time of the first order
+        :param buffer_size: orders read ahead at most
+        """
+        self.orders = iter(orders)
+        self.timeScale = float(time_scale)
+        self.start = start
+        self.bufferSize = buffer_size
+        self.buffer = deque()  # (time step, position)
+        self.exhausted = False
+
+    def fill(self):
+        """
+        Read orders from the source until the buffer is full or the source is exhausted
+        """
+        if self.exhausted:
+            return
+        size = len(self.buffer)
+        for time, pos in itertools.islice(self.orders, self.bufferSize - size):
+            if self.start is None:
+                self.start = time
+            self.buffer.append((int((time - self.start) / self.timeScale), pos))
+        if len(self.buffer) < self.bufferSize:
+            self.exhausted = True
+
+    def next_time(self):
+        """
+        Return the time step of the next order, None once the source is exhausted
+        :return: time step
+        """
+        if not self.buffer:
+            self.fill()
+        return self.buffer[0][0] if self.buffer else None
+
+    def due(self, timer):
+        """
+        Remove and return the orders due at or before a time step
+        :param timer: time step
+        :return: (list)position
+        """
+        positions = []
+        while True:
+            if not self.buffer:
+                self.fill()
+                if not self.buffer:
+                    break
+            if self.buffer[0][0] > timer:
+                break
+            positions.append(self.buffer.popleft()[1])
+        return positions
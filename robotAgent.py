@@ -1,36 +1,40 @@
 from actions import Actions
 from task import Task
 from search import PathFind
+from state import StateField
 import util
-import copy
 
 
-class RobotAgent():
-    def __init__(self, world, canvas, size, pos, capacity=util.ROBOT_CAPACITY, power=100000):
+class RobotAgent(object):
+    # Kept in the world's FleetState once the robot is added to the world
+    capacity = StateField('capacity')
+    load = StateField('load')
+    power = StateField('power')
+    capacityCount = StateField('capacityCount')
+    slot = None
+    store = None
+
+    def __init__(self, world, size, pos, capacity=util.ROBOT_CAPACITY, power=100000):
         """
         Initilize the robot
         :param world:
-        :param canvas:
         :param size:
         :param pos:
         :param capacity:
         :param power:
         """
-        self.pos = copy.deepcopy(pos)
+        self.pos = pos[:]
         self.world = world
-        self.canvas = canvas
         self.size = size
         self.index = len(world.robots)+1
         self.capacity = capacity
         self.maxPower = power
-        self.power = copy.deepcopy(power)
+        self.power = power
         self.load = 0
         self.status = "Waiting for Order"
-        self.id_shape = self.canvas.create_oval(self.pos[0] * self.size, self.pos[1] * self.size, (self.pos[0] + 1) * self.size, (self.pos[1] + 1) * self.size, fill="green", tag="robot" + str(self.index))
-        self.id_text = self.canvas.create_text((self.pos[0] + 0.5) * self.size, (self.pos[1] + 0.5) * self.size, fill="black", text=self.index, tag="robot" + str(self.index))
         self.task = []
         self.path = []
-        self.station = Task(canvas=self.canvas, world=self.world, pos=self.world.stations[0].pos[:], isStation=True)
+        self.station = Task(world=self.world, pos=self.world.stations[0].pos[:], isStation=True)
         self.assignable = True
         self.capacityCount = 0
         self.pathfinder = PathFind(self)
@@ -40,18 +44,18 @@ class RobotAgent():
         Move the robot in the direction
         :param direction:
         """
+        if direction == Actions.STOP:
+            return
         possible_actions = self.get_possible_actions()
         if direction in possible_actions and self.power:
+            old_pos = self.pos[:]
             self.pos[0] += direction[0]
             self.pos[1] += direction[1]
+            self.world.occupancy.move_robot(self, old_pos)
+            self.world.fleet.move(self)
             self.power -= 1
             self.world.totalMileage += 1
-            # Animate the movement of robot
-            if util.GRAPHICS_ON:
-                for x in range(0, 2):
-                    for obj in self.canvas.find_withtag("robot" + str(self.index)):
-                        self.canvas.move(obj, direction[0] * self.size / 2, direction[1] * self.size / 2)
-                        self.canvas.update()
+            self.world.graphics.on_robot_moved(self, direction)
         elif not self.power:
             self.set_status("Out of Power")
         else:
@@ -60,11 +64,33 @@ class RobotAgent():
             path.append(self.path)
             self.set_path(path)
 
+    def jump(self, cells):
+        """
+        Move the robot along a path in one go, as far as its power lasts. Used by the discrete-event simulation,
+        where robots do not block each other.
+        :param cells: (list)(tuple)position starting at the current position
+        :return: number of steps moved
+        """
+        steps = max(min(len(cells) - 1, self.power), 0)
+        if steps:
+            old_pos = self.pos[:]
+            self.pos[0], self.pos[1] = cells[steps]
+            self.world.occupancy.move_robot(self, old_pos)
+            self.world.fleet.move(self)
+            self.power -= steps
+            self.world.totalMileage += steps
+            self.world.graphics.on_robot_moved(self, None)
+        if not self.power:
+            self.set_status("Out of Power")
+        return steps
+
     def get_possible_actions(self):
         """
         Return the possition actions at the current state
         :return: (list)directions
         """
+        if self.world.cooperativePlanner:
+            return Actions.get_cooperative_actions(self.pos, self.world)
         return Actions.get_possible_actions(self.pos, self.world)
 
     def set_task(self, task):
@@ -95,16 +121,20 @@ class RobotAgent():
                 self.capacityCount += 1
                 self.load += 1
                 self.world.completedTask += 1
-                if task.index <= util.INITIAL_TASK:
-                    self.world.taskRewards += util.TASK_REWARD * pow(util.DISCOUNTING_FACTOR, self.world.timer)
+                if task.arrival is not None:
+                    self.world.taskRewards += util.calculate_discounted_reward(self.world.timer - task.arrival)
+                elif task.index <= util.INITIAL_TASK:
+                    self.world.taskRewards += util.calculate_discounted_reward(self.world.timer)
                 else:
-                    self.world.taskRewards += util.TASK_REWARD * pow(util.DISCOUNTING_FACTOR, (self.world.timer - (task.index - util.INITIAL_TASK) * util.TASK_TIME_INTERVAL))
+                    self.world.taskRewards += util.calculate_discounted_reward(
+                        self.world.timer - (task.index - util.INITIAL_TASK) * util.TASK_TIME_INTERVAL)
             if self.world.mode == 10:
                 if not task.isStation:
-                    self.world.canvas.delete(task.id_shape)
-                    self.world.canvas.delete(task.id_text)
+                    self.world.graphics.on_task_removed(task)
                 if task in self.world.tasks:
                     self.world.tasks.remove(task)
+                    self.world.taskState.remove(task)
+                    self.world.occupancy.remove_task(task)
 
     def set_path(self, path):
         """
@@ -134,13 +164,14 @@ class RobotAgent():
         """
         return self.world.find_station_at(self.pos)
 
-    def charge_battery(self):
+    def charge_battery(self, ticks=1):
         """
         Charge battery and increment the power of robot
+        :param ticks: time steps spent charging
         """
         station = self.world.find_station_at(self.station.pos)
         if station:
-            self.power = min(self.power + station.chargingRate, self.maxPower)
+            self.power = min(self.power + station.chargingRate * ticks, self.maxPower)
 
     def follow_path(self):
         """
@@ -163,9 +194,16 @@ class RobotAgent():
         if not self.task or self.task[0].isStation:
             self.line_up_at(self.station.pos)
 
-        self.pathfinder = PathFind(self)
+        if self.world.cooperativePlanner:
+            self.set_path(self.world.cooperativePlanner.plan(self))
+            return
+
         try:
-            dir_path = self.pathfinder.perform_a_star_search()[1]
+            if self.world.incrementalPlanner:
+                dir_path = self.world.incrementalPlanner.plan(self)[1]
+            else:
+                self.pathfinder = PathFind(self)
+                dir_path = self.pathfinder.perform_a_star_search()[1]
         except TypeError:
             print 'error'
             dir_path = self.path
@@ -177,14 +215,14 @@ class RobotAgent():
             if self is not self.world.find_robot_at([x, y]):
                 self.line_up_at([x - 1, y])
             else:
-                self.task = [Task(canvas=self.canvas, world=self.world, pos=[x, y], isStation=True)]
+                self.task = [Task(world=self.world, pos=[x, y], isStation=True)]
         elif self.world.has_robot_at([x-1,y]):
             if self is not self.world.find_robot_at([x-1, y]):
                 self.line_up_at([x-2,y])
             else:
-                self.task = [Task(canvas=self.canvas, world=self.world, pos=[x, y], isStation=True)]
+                self.task = [Task(world=self.world, pos=[x, y], isStation=True)]
         else:
-            self.task = [Task(canvas=self.canvas, world=self.world, pos=[x, y], isStation=True)]
+            self.task = [Task(world=self.world, pos=[x, y], isStation=True)]
 
     def return_to_station(self):
         """
@@ -1,7 +1,13 @@
-from actions import Actions
+from collections import OrderedDict, deque
+import itertools
 import util
 import heapq
 
+# Number of wall-only paths kept by the shared path cache
+PATH_CACHE_SIZE = 4096
+# Source of the ids that tell the layouts of the worlds apart in the path cache
+LAYOUT_IDS = itertools.count()
+
 
 class Node:
     def __init__(self, pos):
@@ -57,6 +63,49 @@ class Node:
         return self.prev
 
 
+class PathCache():
+    """
+    Least recently used cache of wall-only shortest paths, keyed by (start, goal, layout id) and shared by every
+    world. A cached path is only used while no robot blocks it, then it is as short as a new search would find.
+    """
+
+    def __init__(self, size=PATH_CACHE_SIZE):
+        self.size = size
+        self.paths = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Return the cached path of a key and mark it as recently used
+        :param key: (start, goal, layout id)
+        :return: (tuple)abs_path or None
+        """
+        path = self.paths.pop(key, None)
+        if path is not None:
+            self.paths[key] = path
+        return path
+
+    def put(self, key, path):
+        """
+        Cache a path, evicting the least recently used one when full
+        :param key: (start, goal, layout id)
+        :param path: (tuple)(tuple)position
+        """
+        self.paths.pop(key, None)
+        self.paths[key] = path
+        if len(self.paths) > self.size:
+            self.paths.popitem(last=False)
+
+    def clear(self):
+        self.paths.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+PATH_CACHE = PathCache()
+
+
 class PathFind:
     def __init__(self, robot):
         """
@@ -64,123 +113,158 @@ class PathFind:
         :param robot:
         """
         self.robot = robot
-        self.start = Node(self.robot.pos)
+        self.start = Node(self.robot.pos[:])
         self.current = self.start
         if self.robot.task:
             self.goals = [Node(self.robot.task[0].pos)]
         else:
             self.goals = []
+        oracle = self.robot.world.distanceOracle
+        self.goalRows = [oracle.heuristic_row(goal.pos) for goal in self.goals]
+        self.goalCosts = [(tuple(goal.pos), row) for goal, row in zip(self.goals, self.goalRows)]
+        self.cellIndex = oracle.index if any(row is not None for row in self.goalRows) else {}
         self.toNeighbours = False
+        self.expansions = 0
 
     def perform_a_star_search(self):
         """
-        A regular A* graph search that returns the absolute path and relative path (in terms of directions)
+        Return the absolute path and relative path (in terms of directions) to the goal, from the shared
+        path cache when a cached path is not blocked by robots, then from the hierarchical planner of a large floor
+        when its path is not blocked either, and from an A* search otherwise.
+        Paths the search proves to be wall-only shortest paths are cached.
         :return: absPath, dirPath
         """
-        closed_set = []
+        world = self.robot.world
+        key = None
+        if len(self.goals) == 1:
+            key = (tuple(self.robot.pos), tuple(self.goals[0].pos), world.layoutId)
+            path = PATH_CACHE.get(key)
+            if path is not None and self.is_path_free(path):
+                PATH_CACHE.hits += 1
+                world.metrics.count('path_cache_hits')
+                return self.to_dir_path([list(pos) for pos in path])
+            PATH_CACHE.misses += 1
+            planner = world.hierarchicalPlanner
+            if planner is not None:
+                result = planner.plan(self.robot)
+                if result is not None and self.is_path_free([tuple(pos) for pos in result[0]]):
+                    return result
+
+        result = self.a_star_search()
+        world.metrics.count('searches')
+        world.metrics.count('expansions', self.expansions)
+        if result is not None and key is not None:
+            path = result[0]
+            cost = sum(world.gridCost.get(tuple(path[i]) + tuple(path[i + 1])) for i in range(len(path) - 1))
+            # Outside mode 1 robots block cells, the path is only wall-only shortest if it is as short as the
+            # heuristic, which never overestimates the wall-only cost
+            if world.mode == 1 or cost <= self.start.get_total_cost():
+                PATH_CACHE.put(key, tuple(tuple(pos) for pos in path))
+        return result
+
+    def is_path_free(self, path):
+        """
+        Whether no robot blocks a cached path
+        :param path: (tuple)(tuple)position
+        :return: boolean
+        """
+        if self.robot.world.mode == 1:
+            return True
+        robots = self.robot.world.occupancy.robots
+        for pos in path[1:]:
+            if pos in robots:
+                return False
+        return True
 
-        # The set of currently discovered nodes that are not evaluated yet.
-        # Initially, only the start node is known.
-        open_set = [self.start]
+    def a_star_search(self):
+        """
+        A regular A* graph search that returns the absolute path and relative path (in terms of directions).
+        The open set is a binary heap of cells with lazy deletion, travel costs and parents are kept per cell.
+        Moves into walls and one-way moves cost inf in grid_cost, outside mode 1 cells with robots are blocked too.
+        :return: absPath, dirPath
+        """
+        world = self.robot.world
+        grid_cost = world.gridCost
+        robots = {} if world.mode == 1 else world.occupancy.robots
+        goals = set(tuple(goal.pos) for goal in self.goals)
+        heuristic = self.get_heuristic_cost
+        inf = float('inf')
 
+        start = tuple(self.robot.pos)
         self.start.set_travel_cost(0)
-        self.start.set_total_cost(self.get_heuristic_cost(self.start))
-
-        while len(open_set) > 0:
-            self.current = self.get_min_cost_node(open_set)
-            open_set.remove(self.current)
-            closed_set.append(self.current)
-
-            for goal in self.goals:
-                if self.current.pos == goal.pos:
-                    return self.reconstruct_path(self.current)
-
-            successors = self.get_robot_successors(self.current.pos)
-
-            for node in successors:
-                if self.check_node_in_set(node, closed_set):
+        self.start.set_total_cost(heuristic(start))
+        travel_cost = {start: 0}
+        came_from = {start: None}
+        closed_set = set()
+
+        # Entries are (total cost, push order, cell), outdated entries are skipped when popped.
+        # Initially, only the start cell is known.
+        open_set = [(self.start.get_total_cost(), 0, start)]
+        push_count = 1
+
+        while open_set:
+            total_cost, order, current = heapq.heappop(open_set)
+            if current in closed_set:
+                continue
+            closed_set.add(current)
+
+            if current in goals:
+                self.expansions = len(closed_set)
+                return self.reconstruct_path(came_from, current)
+
+            current_cost = travel_cost[current]
+            for pos, one_step_cost in grid_cost.moves(current[0], current[1]):
+                if one_step_cost == inf or pos in closed_set or pos in robots:
                     continue
-
-                if not self.check_node_in_set(node, open_set):
-                    open_set.append(node)
-
-                one_step_cost=self.robot.world.gridCost.get(tuple(self.current.pos+node.pos))
-                tentative_travel_cost = self.current.get_travel_cost() + one_step_cost
-                if tentative_travel_cost >= node.get_travel_cost():
+                tentative_travel_cost = current_cost + one_step_cost
+                if tentative_travel_cost >= travel_cost.get(pos, inf):
                     continue
 
-                node.set_previous_node(self.current)
-                node.set_travel_cost(tentative_travel_cost)
-                node.set_total_cost(node.get_travel_cost() + self.get_heuristic_cost(node))
+                came_from[pos] = current
+                travel_cost[pos] = tentative_travel_cost
+                heapq.heappush(open_set, (tentative_travel_cost + heuristic(pos), push_count, pos))
+                push_count += 1
+        self.expansions = len(closed_set)
 
-    def reconstruct_path(self, current):
+    def reconstruct_path(self, came_from, current):
         """
         Reconstruct the absolute and directional path based on the results of A* search.
-        :param current:
+        :param came_from: (dict) cell: previous cell
+        :param current: goal cell
         :return: abs_path, dir_path
         """
-        path = [current.pos]
-        dir_path = []
-        while current.get_previous_node().pos != current.pos:
-            current = current.get_previous_node()
-            path.insert(0, current.pos)
+        path = []
+        while current is not None:
+            path.append(list(current))
+            current = came_from[current]
+        path.reverse()
+        return self.to_dir_path(path)
 
+    def to_dir_path(self, path):
+        """
+        Return an absolute path together with its directional path
+        :param path: (list)position
+        :return: abs_path, dir_path
+        """
+        dir_path = []
         for i in range(len(path) - 1):
             dir_path.append([path[i + 1][0] - path[i][0], path[i + 1][1] - path[i][1]])
-
         return path, dir_path
 
-    def check_node_in_set(self, node, target_set):
-        """
-        Returns whether the set contains a node with identical position with the parameter node.
-        :param node:
-        :param target_set:
-        :return: boolean
-        """
-        for setNode in target_set:
-            if node.pos == setNode.pos:
-                return True
-        return False
-
-    def get_robot_successors(self, pos):
-        """
-        Returns the successor positions of the robot at pos
-        :param pos:
-        :return: (list)position
-        """
-        possible = Actions.get_possible_actions(pos, self.robot.world)
-        if possible == [Actions.STOP]:
-            possible = Actions.get_possible_actions(pos, self.robot.world)
-        successor = []
-        for direction in possible:
-            x = pos[0] + direction[0]
-            y = pos[1] + direction[1]
-            successor.append(Node([x, y]))
-        return successor
-
-    def get_min_cost_node(self, target_set):
-        """
-        Returns the node in target_set with the lowest cost
-        :param target_set:
-        :return: min_node
+    def get_heuristic_cost(self, pos):
         """
-        min_val = 1000000
-        min_node = None
-        for node in target_set:
-            if node.get_total_cost() < min_val:
-                min_val = node.get_total_cost()
-                min_node = node
-        return min_node
-
-    def get_heuristic_cost(self, node):
-        """
-        Calculate the heuristic cost of a particular node
-        :param node:
+        Calculate the heuristic cost of a cell, the wall-only travel cost to the closest goal where the distance
+        oracle provides it and the manhattan distance otherwise
+        :param pos: (tuple)position
         :return: heuristic_cost
         """
         min_dist = 1000000
-        for goal in self.goals:
-            dist = util.calculate_manhattan_distance(node.pos, goal.pos)
+        i = self.cellIndex.get(pos)
+        for goal, row in self.goalCosts:
+            if row is not None and i is not None:
+                dist = row.item(i)
+            else:
+                dist = abs(pos[0] - goal[0]) + abs(pos[1] - goal[1])
             if dist < min_dist:
                 min_dist = dist
         return min_dist
@@ -195,6 +279,17 @@ class PathFind:
 """
 
 
+class Route():
+    """
+    Sequence of linked vertices of a Graph. Its id is the position of the group in the original group list,
+    groups merged into it are dropped, so routes keep the order of that list.
+    """
+
+    def __init__(self, route_id, vert):
+        self.id = route_id
+        self.verts = deque([vert])
+
+
 class Graph:
     """
     Class Graph based on the graph theory
@@ -202,98 +297,114 @@ class Graph:
 
     def __init__(self, nodes):
         self.__vertices = []
-        self.__graph_group = []  # (list)[[group 0],[group 1]...] elements linked together are put in the same group
+        self.__routes = {}  # route id: route, elements linked together are put in the same route
+        self.__owner = {}  # vert: route holding it
+        self.__full = set()  # ids of the routes of ROBOT_CAPACITY vertices
         for i in range(nodes):
             self.__vertices.append(i)
-            self.__graph_group.append([i])
+            route = Route(i, i)
+            self.__routes[i] = route
+            self.__owner[i] = route
+            self.update_full(route)
 
     def location(self, vert):
         """
-        Find out where the vert is in the self.__graph_group
+        Find out which route the vert is in
         :param vert
-        :return: i,j i_th group, j_th element
+        :return: route
         """
-        i = 0
-        for group in self.__graph_group:
-            j = 0
-            for item in group:
-                if vert == item:
-                    return i, j
-                j += 1
-            i += 1
+        return self.__owner[vert]
 
-    def is_head(self, loc):
+    def is_head(self, vert):
         """
-        Whether the vert is the 1st element in the group
-        :param loc: from self.location()
+        Whether the vert is the 1st element in its route
+        :param vert:
         :return: boolean
         """
-        (i, j) = loc
-        if j == 0:
-            return True
-        else:
-            return False
+        return self.__owner[vert].verts[0] == vert
 
-    def is_tail(self, loc):
+    def is_tail(self, vert):
         """
-        Whether the vert is the last element in the group
-        :param loc: from self.location()
+        Whether the vert is the last element in its route
+        :param vert:
         :return: boolean
         """
-        (i, j) = loc
-        if j == len(self.__graph_group[i]) - 1:
-            return True
-        else:
-            return False
+        return self.__owner[vert].verts[-1] == vert
 
     def set_edge(self, vert1, vert2):
         """
-        Set the edge of two vertex, updating the self.__graph_group
+        Set the edge of two vertex, merging the route of vert2 into the route of vert1
         :param vert1:
         :param vert2:
         :return: True for success, False for fail
         """
-        loc1 = self.location(vert1)
-        loc2 = self.location(vert2)
-        if loc1[0] == loc2[0]:
+        route1 = self.location(vert1)
+        route2 = self.location(vert2)
+        if route1 is route2:
             return False
-        if self.is_tail(loc1):
-            if self.is_head(loc2):
-                self.__graph_group[loc1[0]] = self.__graph_group[loc1[0]] + self.__graph_group[loc2[0]]
-                self.__graph_group.pop(loc2[0])
+        if self.is_tail(vert1):
+            if self.is_head(vert2):
+                self.merge(route1, route2, route1.verts, route2.verts)
                 return True
-            elif self.is_tail(loc2):
-                self.__graph_group[loc1[0]] = self.__graph_group[loc1[0]] + self.__graph_group[loc2[0]][::-1]
-                self.__graph_group.pop(loc2[0])
+            elif self.is_tail(vert2):
+                self.merge(route1, route2, route1.verts, deque(reversed(route2.verts)))
                 return True
-        elif self.is_head(loc1):
-            if self.is_head(loc2):
-                self.__graph_group[loc1[0]] = self.__graph_group[loc2[0]][::-1] + self.__graph_group[loc1[0]]
-                self.__graph_group.pop(loc2[0])
+        elif self.is_head(vert1):
+            if self.is_head(vert2):
+                self.merge(route1, route2, deque(reversed(route2.verts)), route1.verts)
                 return True
-            elif self.is_tail(loc2):
-                self.__graph_group[loc1[0]] = self.__graph_group[loc2[0]] + self.__graph_group[loc1[0]]
-                self.__graph_group.pop(loc2[0])
+            elif self.is_tail(vert2):
+                self.merge(route1, route2, route2.verts, route1.verts)
                 return True
 
+    def merge(self, route1, route2, left, right):
+        """
+        Replace route1 and route2 by left followed by right, keeping the id of route1. The vertices of the
+        shorter sequence are added to the longer one, so a vertex changes route O(log n) times at most.
+        :param route1:
+        :param route2:
+        :param left: (deque)vertices
+        :param right: (deque)vertices
+        """
+        if len(left) >= len(right):
+            keep = self.__owner[left[0]]
+            left.extend(right)
+            verts, moved = left, right
+        else:
+            keep = self.__owner[right[0]]
+            right.extendleft(reversed(left))
+            verts, moved = right, left
+        del self.__routes[route2.id]
+        self.__full.discard(route2.id)
+        keep.id = route1.id
+        keep.verts = verts
+        self.__routes[keep.id] = keep
+        for vert in moved:
+            self.__owner[vert] = keep
+        self.update_full(keep)
+
+    def update_full(self, route):
+        if len(route.verts) == util.ROBOT_CAPACITY:
+            self.__full.add(route.id)
+        else:
+            self.__full.discard(route.id)
+
     def load(self, vert):
         """
 
         :param vert:
         :return: (int) amount of the tasks
         """
-        loc = self.location(vert)
-        load = len(self.__graph_group[loc[0]])
-        return load
+        return len(self.location(vert).verts)
 
     def gen_link(self):
         """
 
         :return: (list)
         """
-        if self.__graph_group:
-            link = max(self.__graph_group, key=lambda x: len(x))
-            return link
+        if self.__routes:
+            route = max(sorted(self.__routes.values(), key=lambda x: x.id), key=lambda x: len(x.verts))
+            return list(route.verts)
         return None
 
     def try_gen_link(self):
@@ -301,9 +412,8 @@ class Graph:
 
         :return: (list)link or None
         """
-        for link in self.__graph_group:
-            if len(link) == util.ROBOT_CAPACITY:
-                return link
+        if self.__full:
+            return list(self.__routes[min(self.__full)].verts)
         return None
 
 
@@ -362,58 +472,106 @@ def a_star_planning(world, start, goal):
     return came_from, cost_so_far[current]
 
 
-def saving_dist_table(world):
+class SavingsTable():
     """
-    Calculate distance cost saving between each two task positions
-    and sort the saving decreasingly. Used in Clarke and Wright Algorithm only.
-    :param world:
-    :return: (list)saving_table
+    Clarke and Wright savings between the candidate tasks, the first ROBOT_CAPACITY * TEMPORAL_PRIORITY_FACTOR
+    tasks of world.taskCache, kept in a heap across allocations. The savings of a task are added once when it
+    becomes a candidate and dropped lazily when it is handed to a robot. Depot costs are travel costs from the
+    single START_POINT row, costs between tasks are DistanceOracle.estimate values, so large layouts do not
+    compute a row per task.
     """
-    task_pos_list = []
-    task_num = int(util.ROBOT_CAPACITY * util.TEMPORAL_PRIORITY_FACTOR)
-    for item in world.taskCache[:task_num]:
-        task_pos_list.append(item.pos)
-    task_num = len(task_pos_list)
-    distance_table = {}
-    for index, task in enumerate(task_pos_list):
-        cost = a_star_planning(world, util.START_POINT, task)[1]
-        distance_table[(-1, index)] = cost
-    for index1 in range(0, len(task_pos_list) - 1):
-        for index2 in range(index1 + 1, len(task_pos_list)):
-            cost = a_star_planning(world, task_pos_list[index1], task_pos_list[index2])[1]
-            distance_table[(index1, index2)] = cost
-    saving_table = {}
-    for (task1, task2) in distance_table:
-        if task1 != -1:
-            saving_table[(task1, task2)] = \
-                distance_table[(-1, task1)] + distance_table[(-1, task2)] - distance_table[(task1, task2)]
-    saving_table = sorted(saving_table.items(), key=lambda x: x[1], reverse=True)
-    return saving_table, task_num
+
+    def __init__(self, world):
+        self.world = world
+        self.heap = []  # (-saving, sequence1, sequence2), the best merge first
+        self.members = {}  # sequence: task
+        self.sequences = {}  # task: sequence
+        self.depotCost = {}  # sequence: travel cost from START_POINT to the task
+        self.counter = itertools.count()
+
+    @staticmethod
+    def get_capacity():
+        return int(util.ROBOT_CAPACITY * util.TEMPORAL_PRIORITY_FACTOR)
+
+    def add_task(self, task):
+        """
+        Make a task a candidate if there is room for it, computing its savings with every other candidate
+        :param task:
+        """
+        if task in self.sequences or len(self.members) >= self.get_capacity():
+            return
+        oracle = self.world.distanceOracle
+        sequence = next(self.counter)
+        depot_cost = oracle.distance(util.START_POINT, task.pos)
+        for other, other_task in self.members.iteritems():
+            saving = self.depotCost[other] + depot_cost - oracle.estimate(other_task.pos, task.pos)
+            heapq.heappush(self.heap, (-saving, other, sequence))
+        self.members[sequence] = task
+        self.sequences[task] = sequence
+        self.depotCost[sequence] = depot_cost
+
+    def remove_task(self, task):
+        """
+        Drop a task from the candidates, its savings are skipped from now on
+        :param task:
+        """
+        sequence = self.sequences.pop(task, None)
+        if sequence is None:
+            return
+        del self.members[sequence]
+        del self.depotCost[sequence]
+        # Rebuild the heap once most of its entries are outdated
+        size = len(self.members)
+        if len(self.heap) > size * (size - 1):
+            self.heap = [entry for entry in self.heap if entry[1] in self.members and entry[2] in self.members]
+            heapq.heapify(self.heap)
+
+    def update(self, tasks):
+        """
+        Make the candidates match a list of tasks
+        :param tasks: (list)task
+        """
+        current = set(tasks)
+        for task in self.sequences.keys():
+            if task not in current:
+                self.remove_task(task)
+        for task in tasks:
+            self.add_task(task)
+
+    def iter_savings(self):
+        """
+        Iterate the pairs of candidates by decreasing saving, the heap itself is left untouched
+        :return: (generator)(task, task)
+        """
+        heap = self.heap[:]
+        members = self.members
+        while heap:
+            saving, sequence1, sequence2 = heapq.heappop(heap)
+            if sequence1 in members and sequence2 in members:
+                yield members[sequence1], members[sequence2]
 
 
 def sort_task(world):
     """
-    Generate separated sequences according to the saving_table.
+    Generate separated sequences according to the savings of world.savings.
     :param world:
     :return:(list)[[task00,task01,...],[task10,task11,...],...]
     """
-    (saving_table, task_num) = saving_dist_table(world)
-    task_index_list = range(task_num)
-    g = Graph(len(task_index_list))
-    for item in saving_table:
-        (task1, task2) = item[0]
+    tasks = world.taskCache[:SavingsTable.get_capacity()]
+    world.savings.update(tasks)
+    position = dict((task, index) for index, task in enumerate(tasks))
+    task_num = len(tasks)
+    task_index_list = set(range(task_num))
+    g = Graph(task_num)
+    for pair in world.savings.iter_savings():
+        (task1, task2) = (position[pair[0]], position[pair[1]])
         if len(task_index_list) == 0:
             break
-        if g.try_gen_link():
-            return g.try_gen_link()
+        link = g.try_gen_link()
+        if link:
+            return link
         if g.load(task1) + g.load(task2) <= util.ROBOT_CAPACITY:
             if g.set_edge(task1, task2):
-                try:
-                    task_index_list.remove(task1)
-                except ValueError:
-                    pass
-                try:
-                    task_index_list.remove(task2)
-                except ValueError:
-                    pass
+                task_index_list.discard(task1)
+                task_index_list.discard(task2)
     return g.gen_link()
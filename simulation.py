@@ -0,0 +1,95 @@
+from world import WorldState
+from layout import LAYOUT_MAP
+import util
+from timeit import default_timer
+import random
+import numpy
+
+
+class Simulation():
+    def __init__(self, layout='4', mode=10, fixed_robots=20, random_robots=0, directional=False, seed=None,
+                 planner='astar', allocator='greedy', orders=None, zones=0, zone_workers=0):
+        """
+        Build a world on one of the predefined layouts. The simulation runs headless, a view can be attached
+        to self.world with set_graphics before setup() is called.
+        :param layout: key of LAYOUT_MAP, or a function returning a layout in the same format
+        :param mode: task allocation mode
+        :param fixed_robots: number of robots at the first station
+        :param random_robots: number of robots randomly placed in stations
+        :param directional:
+        :param seed: seed of the random generators, for reproducible runs
+        :param planner: path planner of the robots, see WorldState
+        :param allocator: task allocation of mode 1, see WorldState
+        :param zones: zones of the batch allocation, see WorldState
+        :param zone_workers: worker processes of the zones, see WorldState
+        :param orders: OrderStream the tasks of mode 10 come from, instead of random tasks every task time interval
+        """
+        if seed is not None:
+            random.seed(seed)
+            numpy.random.seed(seed)
+        get_layout = LAYOUT_MAP[layout] if layout in LAYOUT_MAP else layout
+        width, height, gridSize, wall_layout, stations, gridCost = get_layout()
+        self.world = WorldState(width=width, height=height, gridSize=gridSize, layout=wall_layout, stations=stations,
+                                gridCost=gridCost, directional=directional, mode=mode, planner=planner,
+                                allocator=allocator, zones=zones, zone_workers=zone_workers)
+        self.orders = orders
+        self.fixedRobots = fixed_robots
+        self.randomRobots = random_robots
+
+    def setup(self):
+        """
+        Populate the world with the initial robots and tasks. A replay of an order stream only has the tasks of its
+        orders, so no random initial tasks are added then.
+        """
+        world = self.world
+        if self.randomRobots:
+            world.add_random_robot(self.randomRobots)
+        for i in range(self.fixedRobots):
+            world.add_robot(world.stations[0].pos)
+        if not (self.orders and world.mode == 10):
+            world.add_random_task(util.INITIAL_TASK)
+
+        if world.mode == 0:
+            for i in range(len(world.robots)):
+                if i < len(world.tasks):
+                    world.robots[i].add_task(world.tasks[i])
+
+    def step(self):
+        """
+        Advance the simulation by one time step
+        """
+        world = self.world
+        metrics = world.metrics
+        if self.orders and world.mode == 10:
+            start = default_timer()
+            for pos in self.orders.due(world.timer):
+                world.add_order(pos)
+            metrics.lap('add_orders', start)
+        elif world.timer % util.TASK_TIME_INTERVAL == 0 and world.mode == 10:
+            start = default_timer()
+            world.add_random_task(14)
+            metrics.lap('add_random_task', start)
+        world.update()
+        start = default_timer()
+        for robot in world.robots:
+            robot.follow_path()
+        metrics.lap('follow_path', start)
+        metrics.end_tick()
+
+    def is_finished(self):
+        """
+        Check whether the simulation time is reached
+        :return: boolean
+        """
+        return self.world.timer >= util.SIMULATION_TIME
+
+    def run(self):
+        """
+        Run the simulation headless until the simulation time is reached
+        """
+        while not self.is_finished():
+            self.step()
+        if self.world.zoneMap:
+            self.world.zoneMap.close()
+        if self.world.metrics.path:
+            self.world.metrics.export()
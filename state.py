@@ -0,0 +1,244 @@
+from heapq import heappush, heappop
+import numpy
+
+
+class StateField(object):
+    """
+    Attribute of a robot or task kept in a column of its state store. Objects that are not in a store, such as
+    the station tasks of the robots, keep the value in their own __dict__.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, obj, owner):
+        if obj is None:
+            return self
+        if obj.slot is None:
+            return obj.__dict__[self.name]
+        return getattr(obj.store, self.name).item(obj.slot)
+
+    def __set__(self, obj, value):
+        if obj.slot is None:
+            obj.__dict__[self.name] = value
+        else:
+            getattr(obj.store, self.name)[obj.slot] = value
+
+
+class StateStore():
+    """
+    Struct of arrays holding the state fields of a collection of objects, one row (slot) per object.
+    Slots follow the order the objects were added in, removed slots are compacted away once they are the majority.
+    """
+
+    def __init__(self, fields, size=64):
+        """
+        :param fields: (list)(name, dtype) of the StateField columns
+        :param size: initial number of slots
+        """
+        self.fields = fields
+        self.size = 0
+        self.removed = 0
+        self.objects = []  # slot: object, None for removed slots
+        self.live = numpy.zeros(size, dtype=bool)
+        self.pos = numpy.zeros((size, 2), dtype=numpy.int64)
+        for name, dtype in fields:
+            setattr(self, name, numpy.zeros(size, dtype=dtype))
+
+    def columns(self):
+        return ['live', 'pos'] + [name for name, dtype in self.fields]
+
+    def grow(self):
+        """
+        Double the number of slots
+        """
+        for name in self.columns():
+            array = getattr(self, name)
+            grown = numpy.zeros((2 * len(array),) + array.shape[1:], dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+
+    def add(self, obj):
+        """
+        Give an object the next slot, moving its field values into the arrays
+        :param obj: object with a pos and the StateField attributes
+        """
+        if self.size == len(self.live):
+            self.grow()
+        slot = self.size
+        self.size += 1
+        self.objects.append(obj)
+        self.live[slot] = True
+        self.pos[slot] = obj.pos
+        for name, dtype in self.fields:
+            getattr(self, name)[slot] = obj.__dict__.pop(name)
+        obj.slot = slot
+        obj.store = self
+
+    def remove(self, obj):
+        """
+        Free the slot of an object, its field values are moved back into the object
+        :param obj:
+        """
+        slot = obj.slot
+        if slot is None or obj.store is not self:
+            return
+        for name, dtype in self.fields:
+            obj.__dict__[name] = getattr(self, name).item(slot)
+        obj.slot = None
+        obj.store = None
+        self.live[slot] = False
+        self.objects[slot] = None
+        self.removed += 1
+        if self.removed > self.size / 2:
+            self.compact()
+
+    def compact(self):
+        """
+        Drop the removed slots, keeping the order of the others
+        """
+        keep = numpy.nonzero(self.live[:self.size])[0]
+        for name in self.columns():
+            array = getattr(self, name)
+            array[:len(keep)] = array[keep]
+        self.live[len(keep):] = False
+        self.objects = [self.objects[slot] for slot in keep]
+        for slot, obj in enumerate(self.objects):
+            obj.slot = slot
+        self.size = len(keep)
+        self.removed = 0
+
+    def move(self, obj):
+        """
+        Copy the current position of an object into its slot
+        :param obj:
+        """
+        if obj.slot is not None:
+            self.pos[obj.slot] = obj.pos
+
+
+class FleetState(StateStore):
+    """
+    State of the robots of a world, with the distance oracle index of the cell of every robot, so travel costs
+    from the whole fleet to a position are one array lookup in the oracle row of the position where it is known
+    """
+
+    def __init__(self, oracle=None):
+        """
+        :param oracle: DistanceOracle of the layout, travel costs fall back to manhattan distances without one
+        """
+        StateStore.__init__(self, [('capacity', numpy.int64), ('load', numpy.int64), ('power', numpy.int64),
+                                   ('capacityCount', numpy.int64)])
+        self.oracle = oracle
+        self.cell = numpy.zeros(len(self.live), dtype=numpy.int64)  # oracle cell index, -1 off the free cells
+
+    def columns(self):
+        return StateStore.columns(self) + ['cell']
+
+    def add(self, obj):
+        StateStore.add(self, obj)
+        self.move(obj)
+
+    def move(self, obj):
+        StateStore.move(self, obj)
+        if obj.slot is not None and self.oracle is not None:
+            i = self.oracle.cell_index(obj.pos)
+            self.cell[obj.slot] = -1 if i is None else i
+
+    def travel_costs(self, pos, slots=None, k=None):
+        """
+        Wall-only travel costs of robots to a position, see travel_costs
+        :param pos:
+        :param slots: (numpy array) slots of the robots, defaults to every slot
+        :param k: number of closest robots needed, the others may get inf on large layouts
+        :return: (numpy array) float costs, inf for robots that cannot reach pos
+        """
+        if slots is None:
+            slots = numpy.arange(self.size)
+        return travel_costs(self.oracle, self.pos[slots], self.cell[slots], pos, k)
+
+
+def travel_costs(oracle, positions, cells, pos, k=None):
+    """
+    Wall-only travel costs from positions to a position, see DistanceOracle.costs_to. Manhattan distances where
+    there is no oracle, the position is not a free cell or a position is off the free cells.
+    :param oracle: DistanceOracle or None
+    :param positions: (numpy array) n x 2 positions
+    :param cells: (numpy array) oracle cell index of every position, -1 off the free cells
+    :param pos:
+    :param k: number of closest positions needed, the others may get inf on large layouts
+    :return: (numpy array) float costs, inf for positions that cannot reach pos
+    """
+    dist = (numpy.abs(positions[:, 0] - pos[0]) + numpy.abs(positions[:, 1] - pos[1])).astype(float)
+    if oracle is not None:
+        on_cell = cells >= 0
+        if on_cell.any():
+            costs = oracle.costs_to(pos, cells[on_cell], k)
+            if costs is not None:
+                dist[on_cell] = costs
+    return dist
+
+
+class TaskState(StateStore):
+    """
+    State of the tasks of a world, with an urgency queue of the unassigned tasks with orders. All of these tasks
+    lose one time step per timer click, so the queue is keyed by time left plus the number of clicks, which stays
+    the same until the task changes.
+    """
+
+    def __init__(self):
+        StateStore.__init__(self, [('order', numpy.int64), ('timeLeft', numpy.int64), ('assigned', bool),
+                                   ('mean', numpy.float64)])
+        self.clicks = 0
+        self.urgency = []  # (time left + clicks, -slot), outdated entries are skipped
+        self.queued = {}  # slot: key of its entry in self.urgency
+
+    def add(self, obj):
+        StateStore.add(self, obj)
+        self.touch(obj.slot)
+
+    def remove(self, obj):
+        if obj.slot is not None and obj.store is self:
+            self.queued.pop(obj.slot, None)
+        StateStore.remove(self, obj)
+
+    def compact(self):
+        StateStore.compact(self)
+        self.urgency = []
+        self.queued = {}
+        for slot in range(self.size):
+            self.touch(slot)
+
+    def timer_click(self):
+        """
+        Task.timer_click for every task at once
+        """
+        n = self.size
+        self.timeLeft[:n][self.live[:n] & (self.order[:n] != 0)] -= 1
+        self.clicks += 1
+
+    def touch(self, slot):
+        """
+        Queue a task again after its order, time left or assign status changed
+        :param slot:
+        """
+        if not self.live.item(slot) or not self.order.item(slot) or self.assigned.item(slot):
+            self.queued.pop(slot, None)
+            return
+        key = self.timeLeft.item(slot) + self.clicks
+        if self.queued.get(slot) != key:
+            self.queued[slot] = key
+            heappush(self.urgency, (key, -slot))
+
+    def most_urgent(self, limit=100000):
+        """
+        Return the unassigned task with orders that has the least time left, the last added one among equals
+        :param limit: tasks with more time left are left out
+        :return: slot or None
+        """
+        while self.urgency:
+            key, slot = self.urgency[0]
+            if self.queued.get(-slot) == key:
+                return -slot if key - self.clicks <= limit else None
+            heappop(self.urgency)
+        return None
@@ -0,0 +1,182 @@
+from simulation import Simulation
+from events import EventSimulation
+from orders import open_order_file
+from layout import LAYOUT_MAP
+import multiprocessing
+import itertools
+import argparse
+import time
+import util
+import csv
+import sys
+import os
+
+# Sweepable parameters: (command line flag, column name, util constant or None, type, default values)
+PARAMETERS = [('-l', 'layout', None, str, ['4']),
+              ('-m', 'mode', None, int, [10]),
+              ('-fr', 'fixed_robots', None, int, [20]),
+              ('-t', 'initial_task', 'INITIAL_TASK', int, [10]),
+              ('-st', 'simulation_time', 'SIMULATION_TIME', int, [2000]),
+              ('-tr', 'task_reward', 'TASK_REWARD', int, [100]),
+              ('-df', 'discounting_factor', 'DISCOUNTING_FACTOR', float, [0.999]),
+              ('-tpf', 'temporal_priority_factor', 'TEMPORAL_PRIORITY_FACTOR', float, [5]),
+              ('-tg', 'task_time_interval', 'TASK_TIME_INTERVAL', int, [40]),
+              ('-rc', 'robot_capacity', 'ROBOT_CAPACITY', int, [10]),
+              ('-pl', 'planner', None, str, ['astar']),
+              ('-al', 'allocator', None, str, ['greedy']),
+              ('-z', 'zones', None, int, [0]),
+              ('-ev', 'events', None, int, [0]),
+              ('-of', 'order_file', None, str, [None]),
+              ('-os', 'order_time_scale', None, float, [1])]
+
+RESULT_COLUMNS = ['seed', 'taskRewards', 'totalMileage', 'totalReward', 'completedTask', 'completedOrder',
+                  'ticks', 'seconds', 'ticksPerSecond', 'error']
+
+
+def check_params(params):
+    """
+    Return why a parameter set cannot be run
+    :param params: (dict) column name: value
+    :return: error message, None if the set can be run
+    """
+    if params['events'] and params['mode'] != 10:
+        return 'the discrete-event simulation only supports mode 10'
+    if params['zones'] and (params['mode'] != 1 or params['allocator'] != 'batch'):
+        return 'zones only apply to the batch allocation of mode 1'
+    return None
+
+
+def run_simulation(params):
+    """
+    Run one headless simulation, used as the worker function of the process pool. A run that fails returns its
+    error instead of results, so the other runs of the sweep are kept.
+    :param params: (dict) column name: value, for every entry of PARAMETERS plus seed
+    :return: (dict) params and the results or the error of the run
+    """
+    try:
+        return simulate(params)
+    except Exception as e:
+        row = dict(params)
+        row['error'] = '%s: %s' % (type(e).__name__, e)
+        return row
+
+
+def simulate(params):
+    """
+    Run one headless simulation
+    :param params: (dict) column name: value, for every entry of PARAMETERS plus seed
+    :return: (dict) params and the results of the run
+    """
+    for flag, name, constant, value_type, default in PARAMETERS:
+        if constant:
+            setattr(util, constant, params[name])
+    util.GRAPHICS_ON = 0
+
+    orders = None
+    if params['order_file']:
+        orders = open_order_file(params['order_file'], time_scale=params['order_time_scale'])
+    simulation_class = EventSimulation if params['events'] else Simulation
+    simulation = simulation_class(layout=params['layout'], mode=params['mode'], fixed_robots=params['fixed_robots'],
+                                  planner=params['planner'], allocator=params['allocator'], zones=params['zones'],
+                                  orders=orders, seed=params['seed'])
+    start = time.time()
+    simulation.setup()
+    simulation.run()
+    seconds = time.time() - start
+
+    world = simulation.world
+    row = dict(params)
+    row['taskRewards'] = world.taskRewards
+    row['totalMileage'] = world.totalMileage
+    row['totalReward'] = world.taskRewards - world.totalMileage
+    row['completedTask'] = world.completedTask
+    row['completedOrder'] = world.completedOrder
+    row['ticks'] = world.timer
+    row['seconds'] = seconds
+    row['ticksPerSecond'] = world.timer / seconds if seconds else float('inf')
+    return row
+
+
+def parameter_grid(values, seeds):
+    """
+    Expand the swept values into one parameter dict per run
+    :param values: (dict) column name: (list)values
+    :param seeds: (list)seed
+    :return: (list)params
+    """
+    names = [name for flag, name, constant, value_type, default in PARAMETERS]
+    grid = []
+    for combination in itertools.product(*[values[name] for name in names]):
+        for seed in seeds:
+            params = dict(zip(names, combination))
+            params['seed'] = seed
+            grid.append(params)
+    return grid
+
+
+def silence_worker():
+    """
+    Drop the progress prints of the simulation inside the workers
+    """
+    sys.stdout = open(os.devnull, 'w')
+
+
+def sweep(grid, processes=None):
+    """
+    Run every parameter set of the grid over a process pool
+    :param grid: (list)params
+    :param processes: pool size, defaults to the number of cores
+    :return: (list)rows in the order of the grid
+    """
+    pool = multiprocessing.Pool(processes or multiprocessing.cpu_count(), initializer=silence_worker)
+    try:
+        rows = pool.map(run_simulation, grid, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    return rows
+
+
+def write_csv(rows, path):
+    """
+    Write the result table, one row per run
+    :param rows:
+    :param path:
+    """
+    columns = [name for flag, name, constant, value_type, default in PARAMETERS] + RESULT_COLUMNS
+    with open(path, 'wb') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                     description="Run headless simulations over a parameter grid in parallel")
+    for flag, name, constant, value_type, default in PARAMETERS:
+        parser.add_argument(flag, dest=name, type=value_type, nargs='+', default=default, help=name.replace('_', ' '))
+    parser.add_argument('-s', type=int, nargs='+', default=[0], help="random seeds, every set is run once per seed")
+    parser.add_argument('-p', type=int, default=None, help="number of worker processes (default: number of cores)")
+    parser.add_argument('-o', default='sweep.csv', help="output csv file")
+    args = parser.parse_args()
+
+    for layout in args.layout:
+        if layout not in LAYOUT_MAP:
+            parser.error("unknown layout '%s'" % layout)
+
+    grid = []
+    rejected = {}  # error message: number of runs
+    for params in parameter_grid(vars(args), args.s):
+        error = check_params(params)
+        if error:
+            rejected[error] = rejected.get(error, 0) + 1
+        else:
+            grid.append(params)
+    for error, count in sorted(rejected.items()):
+        print 'skipping %d runs: %s' % (count, error)
+    start = time.time()
+    rows = sweep(grid, args.p)
+    write_csv(rows, args.o)
+    failed = len([row for row in rows if row.get('error')])
+    print '%d runs (%d failed) in %.1fs, results written to %s' % (len(rows), failed, time.time() - start, args.o)
@@ -1,33 +1,90 @@
 from util import *
+from state import StateField
+from assignment import finite_assignment
+from collections import deque
 import random
-import copy
+import numpy
 
-class Task():
-    def __init__(self, canvas, world, pos, index=0, cost=10, isStation=False, mean=0.05, timeout=300):
+# Poisson tables by mean, shared by all tasks with the same mean
+POISSON_TABLES = {}
+# Cumulative Poisson tables by mean, for sample_orders
+POISSON_CDFS = {}
+
+
+class OrderLedger():
+    """
+    Outstanding orders of a task in arrival order, as [arrival tick, quantity] entries. Picks consume orders from the
+    oldest entry on, so every entry is added and removed once.
+    """
+
+    def __init__(self):
+        self.entries = deque()
+        self.consumed = 0  # orders of the oldest entry already picked
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, tick, quantity):
+        """
+        Record orders that arrived at a tick
+        :param tick:
+        :param quantity:
+        """
+        if quantity > 0:
+            self.entries.append([tick, quantity])
+
+    def consume(self, quantity):
+        """
+        Remove picked orders, oldest first
+        :param quantity: number of orders picked
+        :return: arrival tick of the entry holding the last picked order (the oldest outstanding entry if quantity
+                 is 0), None if fewer orders were outstanding
+        """
+        entries = self.entries
+        while entries:
+            available = entries[0][1] - self.consumed
+            if quantity < available:
+                self.consumed += quantity
+                return entries[0][0]
+            tick = entries.popleft()[0]
+            self.consumed = 0
+            if quantity == available:
+                return tick
+            quantity -= available
+        return None
+
+
+class Task(object):
+    # Kept in the world's TaskState once the task is added to the world
+    order = StateField('order')
+    timeLeft = StateField('timeLeft')
+    assigned = StateField('assigned')
+    mean = StateField('mean')
+    slot = None
+    store = None
+
+    def __init__(self, world, pos, index=0, cost=10, isStation=False, mean=0.05, timeout=300):
         self.pos = pos
-        self.canvas = canvas
         self.world = world
         self.size = self.world.gridSize * 0.6
         self.timeCost = cost
         self.index = index
         self.isStation = isStation
         self.mean = mean
-        self.timeout = copy.deepcopy(timeout)
-        self.timeLeft = copy.deepcopy(timeout)
-        if not self.isStation:
-            self.id_shape = self.canvas.create_oval(self.pos[0]*self.world.gridSize + 0.5*(self.world.gridSize-self.size), self.pos[1]*(self.world.gridSize) + 0.5*(self.world.gridSize-self.size), (self.pos[0]+1)*self.world.gridSize - 0.5*(self.world.gridSize-self.size), (self.pos[1]+1)*self.world.gridSize - 0.5*(self.world.gridSize-self.size), fill="gray30")
-            self.id_text = self.canvas.create_text((self.pos[0]+0.5)*self.world.gridSize, (self.pos[1]+0.5)*self.world.gridSize, fill="white", text=self.index)
+        self.timeout = timeout
+        self.timeLeft = timeout
         self.progress = 0
         self.timer = 0
         self.order = 0
         self.assigned = False
-        self.p = [0,0,0,0,0,0,0,0,0,0,0]
-        self.records = []
+        self.records = OrderLedger()
+        self.arrival = None  # time step of the order of an order stream, rewards are discounted from it
         self.init_probability()
 
     def init_probability(self):
-        for k in range(11):
-            self.p[k] = exp(-self.mean) * pow(self.mean, k) / factorial(k)
+        if self.mean not in POISSON_TABLES:
+            POISSON_TABLES[self.mean] = [exp(-self.mean) * pow(self.mean, k) / factorial(k) for k in range(11)]
+        self.p = POISSON_TABLES[self.mean]
 
     def check_order(self):
         r = random.uniform(0.0, 1.0)
@@ -35,40 +92,44 @@ class Task():
         for k in range(0, 11):
             if r <= p:
                 self.order += k
-                self.records.append([copy.deepcopy(self.world.timer), self.order])
+                self.records.add(self.world.timer, k)
+                self.update_urgency()
                 break
             elif k != 10:
                 p += self.p[k+1]
 
     def set_assign_status(self, status):
         self.assigned = status
-        if status:
-            self.canvas.itemconfig(self.id_shape, fill="red4")
-            self.canvas.itemconfig(self.id_text, fill="green")
-        else:
-            self.canvas.itemconfig(self.id_text, fill="white")
+        self.update_urgency()
+        self.world.graphics.on_task_assigned(self)
 
     def update_time_left(self, order):
-        for record in self.records:
-            if record[1] >= order:
-                self.timeLeft = self.timeout - (self.world.timer - record[0])
-                if self.order == 0:
-                    self.timeLeft = self.timeout
-                break
-        records_to_delete = []
-        for record in self.records:
-            record[1] = record[1] - order
-            if record[1] <= 0:
-                records_to_delete.append(record)
-        for record in records_to_delete:
-            self.records.remove(record)
+        """
+        Consume picked orders from the records, the time left restarts from the arrival of the order the pick ended in
+        :param order: number of orders picked
+        """
+        arrival = self.records.consume(order)
+        if arrival is not None:
+            self.timeLeft = self.timeout - (self.world.timer - arrival)
+            if self.order == 0:
+                self.timeLeft = self.timeout
+            self.update_urgency()
 
     def timer_click(self):
         if self.order:
             self.timeLeft -= 1
+            self.update_urgency()
 
     def set_order(self, order):
         self.order = order
+        self.update_urgency()
+
+    def update_urgency(self):
+        """
+        Requeue the task in the urgency queue of its task state
+        """
+        if self.store is not None:
+            self.store.touch(self.slot)
 
     def add_progress(self):
         self.set_progress(self.progress + 1)
@@ -92,32 +153,73 @@ class Task():
         return self.timeCost
 
 
+def sample_orders(world):
+    """
+    Task.check_order for every task of the world at once. Each task draws one uniform number that is looked up in
+    the cumulative Poisson table of its mean, draws beyond the last entry of the table give no order, like
+    check_order. New orders are added to the task state and to the records of their tasks.
+    :param world:
+    :return: (numpy array) slots of the tasks with new orders
+    """
+    state = world.taskState
+    slots = numpy.nonzero(state.live[:state.size])[0]
+    draws = numpy.random.random_sample(len(slots))
+    orders = numpy.zeros(len(slots), dtype=numpy.int64)
+    means = state.mean[slots]
+    for mean in numpy.unique(means):
+        if mean not in POISSON_CDFS:
+            if mean not in POISSON_TABLES:
+                POISSON_TABLES[mean] = [exp(-mean) * pow(mean, k) / factorial(k) for k in range(11)]
+            POISSON_CDFS[mean] = numpy.cumsum(POISSON_TABLES[mean])
+        group = means == mean
+        k = numpy.searchsorted(POISSON_CDFS[mean], draws[group])
+        k[k == len(POISSON_CDFS[mean])] = 0
+        orders[group] = k
+    new = slots[orders > 0]
+    state.order[new] += orders[orders > 0]
+    for slot, order in zip(new, orders[orders > 0]):
+        state.objects[slot].records.add(world.timer, int(order))
+        state.touch(slot)
+    return new
+
+
 class TaskAllocation():
     @staticmethod
     def get_closest_robot(world, pos):
-        minDist = 100000
-        result = 0
-        for robot in world.robots:
-            dist = calculate_manhattan_distance(robot.pos, pos)
-            if dist < minDist:
-                minDist = dist
-                result = robot
-        return result
+        # The first added of the robots with the least travel cost to pos
+        fleet = world.fleet
+        slots = numpy.nonzero(fleet.live[:fleet.size])[0]
+        dist = fleet.travel_costs(pos, slots, 1)
+        if not len(slots) or dist.min() >= 100000:
+            return 0
+        return fleet.objects[slots[numpy.argmin(dist)]]
+
+    @staticmethod
+    def get_closest_available_robots(world, pos, k=1, radius=10000):
+        """
+        Return the k robots with the least travel cost to pos that have capacity left and can take another task
+        :param world:
+        :param pos:
+        :param k:
+        :param radius: robots with a higher travel cost are left out
+        :return: (list)robot by increasing travel cost, the first added first among equals
+        """
+        fleet = world.fleet
+        n = fleet.size
+        slots = [slot for slot in numpy.nonzero(fleet.live[:n] & (fleet.capacity[:n] > fleet.load[:n]))[0]
+                 if len(fleet.objects[slot].task) < MAX_TASK_ASSIGNMENT or
+                 TaskAllocation.is_task_station(fleet.objects[slot].task)]
+        slots = numpy.array(slots, dtype=int)
+        dist = fleet.travel_costs(pos, slots, k)
+        within = (dist < 100000) & (dist <= radius)
+        slots, dist = slots[within], dist[within]
+        return [fleet.objects[slot] for slot in slots[numpy.argsort(dist, kind='mergesort')][:k]]
 
     @staticmethod
     def get_closest_available_robot(world, pos, radius=10000):
-        min_dist = 100000
-        result = 0
-        for robot in world.robots:
-            dist = calculate_manhattan_distance(robot.pos, pos)
-            if dist < min_dist and robot.capacity > robot.load and dist <= radius and (len(robot.task) < MAX_TASK_ASSIGNMENT or TaskAllocation.is_task_station(robot.task)):
-                if robot.task:
-                    for robot_task in robot.task:
-                        if not robot_task.isStation or not robot.assignable:
-                            continue
-                min_dist = dist
-                result = robot
-        return result
+        # The robots with capacity left are taken by increasing travel cost, the first one that can take the task wins
+        robots = TaskAllocation.get_closest_available_robots(world, pos, 1, radius)
+        return robots[0] if robots else 0
 
     @staticmethod
     def get_most_needed_task(world):
@@ -131,14 +233,50 @@ class TaskAllocation():
 
     @staticmethod
     def get_most_needed_unassigned_task(world):
-        min_val = 100000
-        result = 0
-        tasks = copy.copy(world.tasks)
-        for task in tasks:
-            if task.order and task.timeLeft <= min_val and not task.assigned:
-                result = task
-                min_val = task.timeLeft
-        return result
+        # The last of the unassigned tasks with orders that have the least time left, from the urgency queue
+        slot = world.taskState.most_urgent()
+        if slot is None:
+            return 0
+        return world.taskState.objects[slot]
+
+    @staticmethod
+    def assign_batch(world):
+        """
+        Assign the unassigned tasks with orders to the free robots at once, minimizing the total travel cost to
+        the tasks plus URGENCY_WEIGHT times their time left. Free robots have capacity left and no task other than
+        their station, robots on their way to a task keep it. With a zone map of the world the assignment is solved
+        per zone, see ZoneMap.assign.
+        :param world:
+        :return: (list)(robot, task) assigned pairs
+        """
+        state = world.taskState
+        n = state.size
+        task_slots = numpy.nonzero(state.live[:n] & (state.order[:n] != 0) & ~state.assigned[:n] &
+                                   (state.timeLeft[:n] <= 100000))[0]
+        fleet = world.fleet
+        m = fleet.size
+        robot_slots = [slot for slot in numpy.nonzero(fleet.capacity[:m] > fleet.load[:m])[0]
+                       if fleet.objects[slot].assignable and
+                       (not fleet.objects[slot].task or TaskAllocation.is_task_station(fleet.objects[slot].task))]
+        if not len(task_slots) or not robot_slots:
+            return []
+
+        robot_slots = numpy.array(robot_slots)
+        urgency = URGENCY_WEIGHT * state.timeLeft[task_slots]
+        if world.zoneMap:
+            cost, assignment = world.zoneMap.assign(fleet, robot_slots, state.pos[task_slots], urgency)
+        else:
+            cost = numpy.empty((len(robot_slots), len(task_slots)))
+            for k, slot in enumerate(task_slots):
+                cost[:, k] = fleet.travel_costs(state.pos[slot], robot_slots) + urgency[k]
+            assignment = finite_assignment(cost)
+
+        # Unreachable pairs are only assigned where nothing else covers the robots or tasks, they are dropped
+        pairs = []
+        for i, k in assignment:
+            if numpy.isfinite(cost[i, k]):
+                pairs.append((fleet.objects[robot_slots[i]], state.objects[task_slots[k]]))
+        return pairs
 
     @staticmethod
     def is_task_station(tasks):
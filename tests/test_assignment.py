@@ -0,0 +1,49 @@
+import itertools
+import unittest
+
+import numpy
+
+from assignment import linear_sum_assignment
+
+
+def brute_force_cost(cost):
+    """
+    Minimum cost of assigning every row (or every column of a wide matrix) by trying all assignments
+    """
+    n, m = cost.shape
+    if n > m:
+        return brute_force_cost(cost.T)
+    return min(sum(cost[i, cols[i]] for i in range(n)) for cols in itertools.permutations(range(m), n))
+
+
+class LinearSumAssignmentTest(unittest.TestCase):
+    def check(self, cost):
+        pairs = linear_sum_assignment(cost)
+        rows = [i for i, j in pairs]
+        cols = [j for i, j in pairs]
+        self.assertEqual(len(pairs), min(cost.shape))
+        self.assertEqual(len(set(rows)), len(rows))
+        self.assertEqual(len(set(cols)), len(cols))
+        self.assertAlmostEqual(sum(cost[i, j] for i, j in pairs), brute_force_cost(cost))
+
+    def test_empty(self):
+        self.assertEqual(linear_sum_assignment(numpy.zeros((0, 3))), [])
+        self.assertEqual(linear_sum_assignment(numpy.zeros((3, 0))), [])
+
+    def test_known_matrix(self):
+        cost = numpy.array([[4, 1, 3], [2, 0, 5], [3, 2, 2]])
+        self.assertEqual(sorted(linear_sum_assignment(cost)), [(0, 1), (1, 0), (2, 2)])
+
+    def test_matches_brute_force(self):
+        rng = numpy.random.RandomState(0)
+        for trial in range(200):
+            n, m = rng.randint(1, 7), rng.randint(1, 7)
+            if trial % 2:
+                cost = rng.randint(0, 5, size=(n, m)).astype(float)  # many ties
+            else:
+                cost = rng.uniform(-10, 10, size=(n, m))
+            self.check(cost)
+
+
+if __name__ == '__main__':
+    unittest.main()
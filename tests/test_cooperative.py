@@ -0,0 +1,137 @@
+import random
+import unittest
+
+from cooperative import CooperativePlanner, ReservationTable
+from layout import LAYOUT_MAP
+from world import WorldState
+
+
+class ReservationTableTest(unittest.TestCase):
+    def setUp(self):
+        self.table = ReservationTable()
+        self.robot1, self.robot2 = object(), object()
+        # robot1 is at (1, 1) at t = 5, (2, 1) at t = 6 and stays at (3, 1) from t = 7 on
+        self.table.reserve(self.robot1, [(1, 1), (2, 1), (3, 1)], 5)
+
+    def test_vertex_conflicts(self):
+        table = self.table
+        self.assertFalse(table.is_free(self.robot2, (2, 1), 6))
+        self.assertTrue(table.is_free(self.robot1, (2, 1), 6))
+        self.assertFalse(table.can_stay(self.robot2, (2, 1), 6))
+        self.assertFalse(table.can_stay(self.robot2, (2, 1), 0))
+
+    def test_swap_conflicts(self):
+        table = self.table
+        self.assertTrue(table.is_swap(self.robot2, (3, 1), (2, 1), 6))
+        self.assertTrue(table.is_swap(self.robot2, (2, 1), (1, 1), 5))
+        self.assertFalse(table.is_swap(self.robot2, (2, 1), (3, 1), 6))  # following, not swapping
+        self.assertFalse(table.is_swap(self.robot2, (3, 1), (2, 1), 5))
+        self.assertFalse(table.is_swap(self.robot1, (3, 1), (2, 1), 6))
+
+    def test_expiry(self):
+        table = self.table
+        # Reservations of the plan only hold at their own time step
+        self.assertTrue(table.is_free(self.robot2, (1, 1), 4))
+        self.assertTrue(table.is_free(self.robot2, (1, 1), 6))
+        self.assertTrue(table.can_stay(self.robot2, (1, 1), 6))
+        self.assertTrue(table.can_stay(self.robot2, (2, 1), 7))
+        # The end of the plan is held from its time step on
+        self.assertTrue(table.is_free(self.robot2, (3, 1), 6))
+        self.assertFalse(table.is_free(self.robot2, (3, 1), 7))
+        self.assertFalse(table.is_free(self.robot2, (3, 1), 1000))
+        self.assertFalse(table.can_stay(self.robot2, (3, 1), 0))
+
+    def test_park_moves(self):
+        table = self.table
+        table.park(self.robot1, (5, 5), 8)
+        self.assertTrue(table.is_free(self.robot2, (3, 1), 1000))
+        self.assertFalse(table.is_free(self.robot2, (5, 5), 8))
+        self.assertEqual(table.parked.keys(), [(5, 5)])
+
+    def test_release(self):
+        table = self.table
+        table.reserve(self.robot2, [(1, 2), (1, 3)], 5)
+        table.release(self.robot1)
+        self.assertTrue(table.is_free(self.robot2, (2, 1), 6))
+        self.assertTrue(table.is_free(self.robot2, (3, 1), 1000))
+        self.assertFalse(table.is_swap(self.robot2, (3, 1), (2, 1), 6))
+        self.assertFalse(table.is_free(self.robot1, (1, 3), 6))
+        table.release(self.robot2)
+        self.assertEqual((table.vertices, table.edges, table.parked, table.owned), ({}, {}, {}, {}))
+        table.release(self.robot2)
+
+
+class CooperativePlannerTest(unittest.TestCase):
+    def setUp(self):
+        width, height, grid_size, layout, stations, grid_cost = LAYOUT_MAP['1']()
+        self.world = WorldState(width=width, height=height, gridSize=grid_size, layout=layout, stations=stations,
+                                gridCost=grid_cost, mode=0, planner='cooperative')
+        self.planner = self.world.cooperativePlanner
+
+    def add_robot(self, start, goal):
+        self.world.add_robot(list(start))
+        robot = self.world.robots[-1]
+        if goal is not None:
+            robot.task = []
+            robot.add_task(self.world.add_task(list(goal)))
+        return robot
+
+    def plan(self, trips):
+        """
+        Plan the trips one robot after the other and return the cells of each robot per time step
+        :param trips: (list)(start, goal)
+        :return: (list)(list)(tuple)position
+        """
+        robots = [self.add_robot(start, goal) for start, goal in trips]
+        self.planner.begin_tick()
+        timelines = []
+        for robot, (start, goal) in zip(robots, trips):
+            cells = [start]
+            for dx, dy in self.planner.plan(robot):
+                cells.append((cells[-1][0] + dx, cells[-1][1] + dy))
+            timelines.append(cells)
+        return timelines
+
+    def assert_no_conflicts(self, timelines):
+        horizon = max(len(cells) for cells in timelines) + 1
+        # Robots stay at the end of their plan
+        timelines = [cells + [cells[-1]] * (horizon - len(cells)) for cells in timelines]
+        for i in range(len(timelines)):
+            for j in range(i + 1, len(timelines)):
+                cells1, cells2 = timelines[i], timelines[j]
+                for t in range(horizon):
+                    self.assertNotEqual(cells1[t], cells2[t])
+                    if t + 1 < horizon and cells1[t] != cells1[t + 1]:
+                        self.assertFalse(cells1[t] == cells2[t + 1] and cells1[t + 1] == cells2[t])
+
+    def test_head_on(self):
+        trips = [((3, 10), (8, 10)), ((9, 10), (2, 10))]
+        timelines = self.plan(trips)
+        self.assert_no_conflicts(timelines)
+        for cells, (start, goal) in zip(timelines, trips):
+            self.assertEqual(cells[-1], goal)
+            for k in range(len(cells) - 1):
+                if cells[k] != cells[k + 1]:
+                    self.assertTrue(self.world.gridCost[cells[k] + cells[k + 1]] < float('inf'))
+
+    def test_fleet(self):
+        rng = random.Random(0)
+        cells = [(x, y) for x in range(2, 18) for y in range(4, 18)]
+        cells = rng.sample(cells, 16)
+        trips = zip(cells[:8], cells[8:])
+        timelines = self.plan(trips)
+        self.assert_no_conflicts(timelines)
+        for cells, (start, goal) in zip(timelines, trips):
+            self.assertEqual(cells[-1], goal)
+
+    def test_goal_taken(self):
+        trips = [((10, 10), None), ((5, 10), (10, 10))]
+        timelines = self.plan(trips)
+        self.assert_no_conflicts(timelines)
+        robot = self.world.robots[-1]
+        self.assertNotEqual(timelines[1][-1], (10, 10))
+        self.assertEqual(self.planner.plans[robot][0], None)  # replaced in the next tick
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+from heapq import heappush, heappop
+import random
+import unittest
+
+import numpy
+
+import distance
+from distance import DistanceOracle
+from layout import LAYOUT_MAP
+
+INF = float('inf')
+
+
+def dijkstra(grid_cost, source, reverse=False):
+    """
+    Travel costs from source, or to source with reverse, over the moves of a GridCost
+    :param grid_cost:
+    :param source: (tuple)position
+    :param reverse: follow the moves backwards
+    :return: (dict)(tuple)position: cost
+    """
+    moves = {}
+    for x in range(grid_cost.cols):
+        for y in range(grid_cost.rows):
+            for cell, cost in grid_cost.moves(x, y):
+                if cost == INF or not grid_cost.moves(*cell):
+                    continue
+                if reverse:
+                    moves.setdefault(cell, []).append(((x, y), cost))
+                else:
+                    moves.setdefault((x, y), []).append((cell, cost))
+    dist = {source: 0}
+    frontier = [(0, source)]
+    while frontier:
+        cost, cell = heappop(frontier)
+        if cost > dist[cell]:
+            continue
+        for neighbour, step_cost in moves.get(cell, ()):
+            new_cost = cost + step_cost
+            if new_cost < dist.get(neighbour, INF):
+                dist[neighbour] = new_cost
+                heappush(frontier, (new_cost, neighbour))
+    return dist
+
+
+class DistanceOracleTest(unittest.TestCase):
+    def setUp(self):
+        # Layout 4 has one-way moves of inf cost and cost 3 counterflow moves
+        self.gridCost = LAYOUT_MAP['4']()[5]
+        self.oracle = DistanceOracle(self.gridCost)
+        self.oracle.build()
+        self.rng = random.Random(0)
+        self.cacheCells = distance.ROW_CACHE_CELLS
+        self.rowLimit = distance.HEURISTIC_ROW_LIMIT
+
+    def tearDown(self):
+        distance.ROW_CACHE_CELLS = self.cacheCells
+        distance.HEURISTIC_ROW_LIMIT = self.rowLimit
+
+    def expected_row(self, pos, reverse=False):
+        dist = dijkstra(self.gridCost, pos, reverse)
+        return numpy.array([dist.get(cell, INF) for cell in self.oracle.cells])
+
+    def test_layout_costs(self):
+        costs = set(cost for key, cost in self.gridCost.iteritems())
+        self.assertTrue(INF in costs)
+        self.assertTrue(3 in costs)
+
+    def test_rows(self):
+        asymmetric = 0
+        for pos in self.rng.sample(self.oracle.cells, 10):
+            row_from, row_to = self.oracle.row_from(pos), self.oracle.row_to(pos)
+            numpy.testing.assert_array_equal(row_from, self.expected_row(pos))
+            numpy.testing.assert_array_equal(row_to, self.expected_row(pos, reverse=True))
+            asymmetric += int((row_from != row_to).sum())
+        self.assertTrue(asymmetric > 0)
+
+    def test_distance_and_path(self):
+        for trip in range(20):
+            start, goal = self.rng.sample(self.oracle.cells, 2)
+            cost = dijkstra(self.gridCost, start).get(goal, INF)
+            self.assertEqual(self.oracle.distance(start, goal), cost)
+            path = self.oracle.path(start, goal)
+            if cost == INF:
+                self.assertEqual(path, None)
+                continue
+            self.assertEqual((path[0], path[-1]), (start, goal))
+            self.assertEqual(sum(self.gridCost[path[k] + path[k + 1]] for k in range(len(path) - 1)), cost)
+
+    def test_closest_costs(self):
+        distance.HEURISTIC_ROW_LIMIT = 0  # rank with partial reverse searches as on large layouts
+        cells = numpy.array(sorted(self.rng.sample(range(len(self.oracle)), 50)))
+        for pos in self.rng.sample(self.oracle.cells, 5):
+            expected = self.expected_row(pos, reverse=True)[cells]
+            for k in (1, 5, 20):
+                costs = self.oracle.costs_to(pos, cells, k)
+                kth = numpy.sort(expected)[k - 1]
+                known = costs < INF
+                numpy.testing.assert_array_equal(costs[known], expected[known])
+                self.assertTrue(known[expected <= kth].all())
+            self.assertFalse(self.oracle.cell_index(pos) in self.oracle.toRows)
+
+    def test_row_eviction(self):
+        distance.ROW_CACHE_CELLS = 3 * len(self.oracle)
+        self.assertEqual(self.oracle.row_cache_size(), 3)
+        a, b, c, d = [self.oracle.cell_index(pos) for pos in self.rng.sample(self.oracle.cells, 4)]
+        cells = self.oracle.cells
+        for i in (a, b, c, a, d):
+            self.oracle.row_from(cells[i])
+        self.assertEqual(self.oracle.fromRows.keys(), [c, a, d])
+        for i in (d, c, b, a):
+            self.oracle.row_to(cells[i])
+        self.assertEqual(self.oracle.toRows.keys(), [c, b, a])
+        self.assertEqual(self.oracle.fromRows.keys(), [c, a, d])
+        # Evicted rows are computed again when needed
+        numpy.testing.assert_array_equal(self.oracle.row_from(cells[b]), self.expected_row(cells[b]))
+        self.assertEqual(self.oracle.fromRows.keys(), [a, d, b])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import math
+import os
+import sys
+import unittest
+
+from events import EventSimulation
+import util
+
+
+class EventSimulationTest(unittest.TestCase):
+    def setUp(self):
+        self.constants = (util.SIMULATION_TIME, util.GRAPHICS_ON, util.INITIAL_TASK, util.TASK_TIME_INTERVAL,
+                          util.ROBOT_CAPACITY, util.TEMPORAL_PRIORITY_FACTOR)
+        # The defaults of main.py
+        util.GRAPHICS_ON = 0
+        util.INITIAL_TASK = 10
+        util.TASK_TIME_INTERVAL = 40
+        util.ROBOT_CAPACITY = 10
+        util.TEMPORAL_PRIORITY_FACTOR = 5
+
+    def tearDown(self):
+        (util.SIMULATION_TIME, util.GRAPHICS_ON, util.INITIAL_TASK, util.TASK_TIME_INTERVAL,
+         util.ROBOT_CAPACITY, util.TEMPORAL_PRIORITY_FACTOR) = self.constants
+
+    def test_long_horizon(self):
+        # Tasks are added faster than one per task time interval, their discount exponents used to reach -100000
+        util.SIMULATION_TIME = 120000
+        simulation = EventSimulation(layout='4', mode=10, fixed_robots=20, seed=0)
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+        try:
+            simulation.setup()
+            simulation.run()
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        world = simulation.world
+        self.assertTrue(world.timer >= 100000)
+        self.assertTrue(world.completedTask > 0)
+        self.assertFalse(math.isinf(world.taskRewards) or math.isnan(world.taskRewards))
+        self.assertTrue(0 < world.taskRewards <= util.TASK_REWARD * world.completedTask)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import random
+import unittest
+
+from distance import DistanceOracle
+from hierarchical import ClusterGraph, HierarchicalPlanner
+from layout import LAYOUT_MAP, generate_layout
+from world import WorldState
+
+# Cost of a hierarchical path over the optimum at most, see HierarchicalPlanner
+MAX_COST_RATIO = 1.5
+
+
+class ClusterGraphTest(unittest.TestCase):
+    def setUp(self):
+        width, height, grid_size, layout, stations, self.gridCost = generate_layout(150, 150, counterflow_cost=3)
+        self.graph = ClusterGraph(self.gridCost, width / grid_size, height / grid_size)
+        self.oracle = DistanceOracle(self.gridCost)
+
+    def cost(self, path):
+        return sum(self.gridCost[path[i] + path[i + 1]] for i in range(len(path) - 1))
+
+    def test_paths_are_valid_and_near_optimal(self):
+        rng = random.Random(0)
+        self.oracle.build()
+        cells = self.oracle.cells
+        trips = 0
+        while trips < 100:
+            start, goal = rng.choice(cells), rng.choice(cells)
+            (x1, y1), (x2, y2) = self.graph.cluster_of(start), self.graph.cluster_of(goal)
+            if abs(x1 - x2) <= 1 and abs(y1 - y2) <= 1:
+                continue  # left to A* by the planner
+            trips += 1
+            path = self.graph.find_path(start, goal)
+            optimum = self.oracle.distance(start, goal)
+            if optimum == float('inf'):
+                self.assertEqual(path, None)
+                continue
+            self.assertEqual(path[0], start)
+            self.assertEqual(path[-1], goal)
+            for i in range(len(path) - 1):
+                self.assertTrue(self.gridCost.get(path[i] + path[i + 1], float('inf')) < float('inf'))
+            self.assertTrue(optimum <= self.cost(path) <= MAX_COST_RATIO * optimum)
+
+    def test_walls(self):
+        self.assertEqual(self.graph.find_path((0, 0), (5, 3)), None)
+        self.assertEqual(self.graph.find_path((5, 3), (5, 3)), [(5, 3)])
+
+
+class HierarchicalPlannerTest(unittest.TestCase):
+    def make_world(self, layout):
+        width, height, grid_size, wall_layout, stations, grid_cost = LAYOUT_MAP[layout]()
+        return WorldState(width=width, height=height, gridSize=grid_size, layout=wall_layout, stations=stations,
+                          gridCost=grid_cost, mode=10, planner='hpa')
+
+    def test_floor_size(self):
+        self.assertFalse(HierarchicalPlanner(self.make_world('4')).is_used())
+        self.assertTrue(HierarchicalPlanner(self.make_world('g200')).is_used())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+from heapq import heappush, heappop
+import random
+import unittest
+
+from incremental import DStarLite
+from layout import LAYOUT_MAP
+
+INF = float('inf')
+
+
+def dijkstra(predecessors, goal, blocked):
+    """
+    Travel costs to goal from every cell that can reach it without entering a blocked cell
+    :param predecessors: (dict)(tuple)position: (list)(position, cost) of the moves into a cell
+    :param goal:
+    :param blocked: (set)(tuple)position
+    :return: (dict)(tuple)position: cost
+    """
+    dist = {goal: 0}
+    frontier = [(0, goal)]
+    while frontier:
+        cost, cell = heappop(frontier)
+        if cost > dist[cell]:
+            continue
+        if cell in blocked:
+            continue  # a robot may stand on the cell but cannot move into it
+        for neighbour, step_cost in predecessors.get(cell, ()):
+            new_cost = cost + step_cost
+            if new_cost < dist.get(neighbour, INF):
+                dist[neighbour] = new_cost
+                heappush(frontier, (new_cost, neighbour))
+    return dist
+
+
+class DStarLiteTest(unittest.TestCase):
+    def setUp(self):
+        # Layout 4 has one-way aisles and cost 3 counterflow moves
+        grid_cost = LAYOUT_MAP['4']()[5]
+        cols, rows = grid_cost.cols, grid_cost.rows
+        self.successors = {}
+        self.predecessors = {}
+        for x in range(cols):
+            for y in range(rows):
+                moves = [(cell, cost) for cell, cost in grid_cost.moves(x, y) if cost < INF]
+                if moves:
+                    self.successors[x, y] = moves
+        for cell, moves in self.successors.items():
+            for neighbour, cost in moves:
+                self.predecessors.setdefault(neighbour, []).append((cell, cost))
+        self.cells = sorted(self.successors)
+        self.rng = random.Random(0)
+
+    def cost(self, path, blocked):
+        total = 0
+        for i in range(len(path) - 1):
+            cell, neighbour = tuple(path[i]), tuple(path[i + 1])
+            self.assertNotIn(neighbour, blocked)
+            total += dict(self.successors[cell])[neighbour]
+        return total
+
+    def check(self, search, start, blocked):
+        result = search.replan(start, set(blocked))  # the search keeps the set to diff the next one against
+        expected = dijkstra(self.predecessors, search.goal, blocked).get(start, INF)
+        if expected == INF:
+            self.assertEqual(result, None)
+            return None
+        path, dir_path = result
+        self.assertEqual(tuple(path[0]), start)
+        self.assertEqual(tuple(path[-1]), search.goal)
+        self.assertEqual(len(dir_path), len(path) - 1)
+        self.assertEqual(self.cost(path, blocked), expected)
+        return path
+
+    def test_blocked_cells(self):
+        for trip in range(20):
+            start, goal = self.rng.sample(self.cells, 2)
+            search = DStarLite(self.successors, self.predecessors, goal, start)
+            blocked = set()
+            path = self.check(search, start, blocked)
+            for round in range(5):
+                # Block cells of the current path and free some of the earlier ones
+                if path and len(path) > 2:
+                    blocked.add(tuple(self.rng.choice(path[1:-1])))
+                blocked.update(self.rng.sample(self.cells, 10))
+                blocked.difference_update(self.rng.sample(sorted(blocked), len(blocked) / 3))
+                blocked.discard(start)
+                blocked.discard(goal)
+                path = self.check(search, start, blocked)
+
+    def test_robot_moves(self):
+        for trip in range(20):
+            start, goal = self.rng.sample(self.cells, 2)
+            search = DStarLite(self.successors, self.predecessors, goal, start)
+            blocked = set()
+            path = self.check(search, start, blocked)
+            while path and len(path) > 1:
+                start = tuple(path[min(len(path) - 1, self.rng.randint(1, 5))])
+                blocked = set(self.rng.sample(self.cells, 20)) - set([start, goal])
+                path = self.check(search, start, blocked)
+
+    def test_unreachable_goal(self):
+        start, goal = self.cells[0], self.cells[-1]
+        search = DStarLite(self.successors, self.predecessors, goal, start)
+        self.check(search, start, set())
+        blocked = set(cell for cell, cost in self.predecessors[goal])
+        blocked.discard(start)
+        self.assertEqual(search.replan(start, blocked), None)
+        self.check(search, start, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from orders import OrderStream, open_order_file
+from simulation import Simulation
+import util
+
+
+class CountingOrders():
+    """
+    Iterable of orders that records how many of them were read
+    """
+
+    def __init__(self, orders):
+        self.orders = orders
+        self.read = 0
+
+    def __iter__(self):
+        for order in self.orders:
+            self.read += 1
+            yield order
+
+
+class OrderStreamTest(unittest.TestCase):
+    def setUp(self):
+        self.orders = [(10.0, [1, 2]), (10.5, [3, 4]), (12.0, [5, 6]), (15.0, [7, 8]), (40.0, [9, 1])]
+
+    def replay(self, stream, timers):
+        return [(timer, stream.due(timer)) for timer in timers]
+
+    def test_round_trip(self):
+        stream = OrderStream(iter(self.orders), buffer_size=2)
+        self.assertEqual(stream.next_time(), 0)
+        self.assertEqual(self.replay(stream, range(31)),
+                         [(0, [[1, 2], [3, 4]]), (1, [])] + [(2, [[5, 6]])] + [(t, []) for t in range(3, 5)] +
+                         [(5, [[7, 8]])] + [(t, []) for t in range(6, 30)] + [(30, [[9, 1]])])
+        self.assertEqual(stream.next_time(), None)
+        self.assertEqual(stream.due(1000), [])
+
+    def test_time_scale_and_start(self):
+        stream = OrderStream(self.orders, time_scale=2, start=0)
+        self.assertEqual(stream.next_time(), 5)
+        self.assertEqual(stream.due(5), [[1, 2], [3, 4]])
+        self.assertEqual(stream.due(7), [[5, 6], [7, 8]])
+        self.assertEqual(stream.next_time(), 20)
+
+    def test_late_timer_takes_all_due_orders(self):
+        stream = OrderStream(self.orders, buffer_size=2)
+        self.assertEqual(stream.due(5), [[1, 2], [3, 4], [5, 6], [7, 8]])
+        self.assertEqual(stream.due(29), [])
+        self.assertEqual(stream.due(30), [[9, 1]])
+
+    def test_reads_ahead_at_most_buffer_size(self):
+        source = CountingOrders(self.orders)
+        stream = OrderStream(source, buffer_size=2)
+        self.assertEqual(source.read, 0)
+        stream.next_time()
+        self.assertEqual(source.read, 2)
+        self.assertEqual(stream.due(0), [[1, 2], [3, 4]])
+        self.assertEqual(source.read, 4)
+        self.assertEqual(len(stream.buffer), 2)
+
+
+class OrderFileTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.orders = [(0.0, [1, 2]), (30.0, [3, 4]), (60.0, [5, 6])]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read_all(self, path, time_scale=1.0):
+        stream = open_order_file(path, time_scale=time_scale)
+        return self.drain(stream)
+
+    def drain(self, stream):
+        orders = []
+        while stream.next_time() is not None:
+            timer = stream.next_time()
+            orders.extend((timer, pos) for pos in stream.due(timer))
+        return orders
+
+    def test_csv(self):
+        path = os.path.join(self.directory, 'orders.csv')
+        with open(path, 'w') as f:
+            f.write('time,x,y\n')
+            for time, (x, y) in self.orders:
+                f.write('%s,%d,%d\n' % (time, x, y))
+        self.assertEqual(self.read_all(path, time_scale=30), [(0, [1, 2]), (1, [3, 4]), (2, [5, 6])])
+
+    def test_jsonl(self):
+        path = os.path.join(self.directory, 'orders.jsonl')
+        with open(path, 'w') as f:
+            f.write(json.dumps({'time': 0, 'pos': [1, 2]}) + '\n\n')
+            f.write(json.dumps({'time': 30, 'x': 3, 'y': 4}) + '\n')
+            f.write(json.dumps({'time': 60, 'pos': [5, 6]}) + '\n')
+        self.assertEqual(self.read_all(path), [(0, [1, 2]), (30, [3, 4]), (60, [5, 6])])
+
+    def test_unknown_format(self):
+        self.assertRaises(ValueError, open_order_file, os.path.join(self.directory, 'orders.txt'))
+
+
+class OrderRewardTest(unittest.TestCase):
+    def setUp(self):
+        self.graphics = util.GRAPHICS_ON
+        util.GRAPHICS_ON = 0
+
+    def tearDown(self):
+        util.GRAPHICS_ON = self.graphics
+
+    def test_discounted_from_arrival(self):
+        simulation = Simulation(layout='4', mode=10, fixed_robots=1, orders=OrderStream([]))
+        simulation.setup()
+        world = simulation.world
+        pos = [6, 3]
+        world.timer = 7
+        self.assertTrue(world.add_order(pos))
+        task = world.tasks[-1]
+        self.assertEqual(task.arrival, 7)
+        self.assertFalse(world.add_order(list(pos)))  # merged into the waiting task, which keeps its arrival
+        self.assertEqual(len(world.tasks), 1)
+
+        world.timer = 17
+        world.robots[0].delete_task(task)
+        self.assertAlmostEqual(world.taskRewards, util.TASK_REWARD * util.DISCOUNTING_FACTOR ** 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import random
+import unittest
+
+from search import Graph
+import util
+
+
+class ListGraph():
+    """
+    The list of groups search.Graph kept before routes, as the reference for merges, loads and links
+    """
+
+    def __init__(self, nodes):
+        self.groups = [[i] for i in range(nodes)]
+
+    def location(self, vert):
+        for i, group in enumerate(self.groups):
+            if vert in group:
+                return i, group.index(vert)
+
+    def set_edge(self, vert1, vert2):
+        (i1, j1), (i2, j2) = self.location(vert1), self.location(vert2)
+        if i1 == i2:
+            return False
+        group1, group2 = self.groups[i1], self.groups[i2]
+        tail1, tail2 = j1 == len(group1) - 1, j2 == len(group2) - 1
+        if tail1 and j2 == 0:
+            merged = group1 + group2
+        elif tail1 and tail2:
+            merged = group1 + group2[::-1]
+        elif not tail1 and j1 == 0 and j2 == 0:
+            merged = group2[::-1] + group1
+        elif not tail1 and j1 == 0 and tail2:
+            merged = group2 + group1
+        else:
+            return None
+        self.groups[i1] = merged
+        self.groups.pop(i2)
+        return True
+
+    def load(self, vert):
+        return len(self.groups[self.location(vert)[0]])
+
+    def gen_link(self):
+        return max(self.groups, key=len) if self.groups else None
+
+    def try_gen_link(self):
+        for group in self.groups:
+            if len(group) == util.ROBOT_CAPACITY:
+                return group
+        return None
+
+
+class GraphTest(unittest.TestCase):
+    def setUp(self):
+        self.capacity = util.ROBOT_CAPACITY
+        util.ROBOT_CAPACITY = 4
+
+    def tearDown(self):
+        util.ROBOT_CAPACITY = self.capacity
+
+    def test_merges_by_end(self):
+        g = Graph(6)
+        self.assertTrue(g.set_edge(0, 1))  # tail to head
+        self.assertEqual(list(g.location(0).verts), [0, 1])
+        self.assertTrue(g.set_edge(1, 2))
+        self.assertTrue(g.set_edge(3, 4))
+        self.assertTrue(g.set_edge(2, 4))  # tail to tail reverses the second route
+        self.assertEqual(list(g.location(3).verts), [0, 1, 2, 4, 3])
+        self.assertTrue(g.set_edge(5, 0))
+        self.assertEqual(list(g.location(0).verts), [5, 0, 1, 2, 4, 3])
+        self.assertEqual(g.load(3), 6)
+
+    def test_head_merges(self):
+        g = Graph(4)
+        g.set_edge(0, 1)
+        g.set_edge(2, 3)
+        self.assertTrue(g.set_edge(0, 2))  # head to head puts the reversed second route first
+        self.assertEqual(list(g.location(0).verts), [3, 2, 0, 1])
+        g = Graph(4)
+        g.set_edge(0, 1)
+        g.set_edge(2, 3)
+        self.assertTrue(g.set_edge(0, 3))  # head to tail puts the second route first
+        self.assertEqual(list(g.location(0).verts), [2, 3, 0, 1])
+
+    def test_rejects_same_route_and_inner_vertices(self):
+        g = Graph(4)
+        g.set_edge(0, 1)
+        g.set_edge(1, 2)
+        self.assertEqual(g.set_edge(2, 0), False)
+        self.assertEqual(g.set_edge(1, 3), None)
+        self.assertEqual(g.load(3), 1)
+
+    def test_links(self):
+        g = Graph(6)
+        self.assertEqual(g.try_gen_link(), None)
+        for vert in range(3):
+            g.set_edge(vert, vert + 1)
+        self.assertEqual(g.try_gen_link(), [0, 1, 2, 3])
+        self.assertEqual(g.gen_link(), [0, 1, 2, 3])
+        self.assertEqual(Graph(0).gen_link(), None)
+
+    def test_matches_list_graph(self):
+        rng = random.Random(0)
+        for trial in range(300):
+            util.ROBOT_CAPACITY = rng.randint(2, 6)
+            nodes = rng.randint(1, 12)
+            g, reference = Graph(nodes), ListGraph(nodes)
+            for step in range(3 * nodes):
+                vert1, vert2 = rng.randrange(nodes), rng.randrange(nodes)
+                if g.load(vert1) + g.load(vert2) > util.ROBOT_CAPACITY:
+                    continue
+                self.assertEqual(g.set_edge(vert1, vert2), reference.set_edge(vert1, vert2))
+                for vert in range(nodes):
+                    self.assertEqual(g.load(vert), reference.load(vert))
+                    self.assertEqual(list(g.location(vert).verts), reference.groups[reference.location(vert)[0]])
+                self.assertEqual(g.gen_link(), reference.gen_link())
+                self.assertEqual(g.try_gen_link(), reference.try_gen_link())
+
+
+if __name__ == '__main__':
+    unittest.main()
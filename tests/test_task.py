@@ -0,0 +1,70 @@
+import random
+import unittest
+
+from task import OrderLedger
+
+
+def consume_records(records, quantity):
+    """
+    The record list scan Task.update_time_left did before the ledger, on [tick, running order count] records
+    """
+    arrival = None
+    for record in records:
+        if record[1] >= quantity:
+            arrival = record[0]
+            break
+    for record in records:
+        record[1] -= quantity
+    records[:] = [record for record in records if record[1] > 0]
+    return arrival
+
+
+class OrderLedgerTest(unittest.TestCase):
+    def test_consumes_oldest_first(self):
+        ledger = OrderLedger()
+        ledger.add(3, 2)
+        ledger.add(5, 0)  # ticks without orders are not recorded
+        ledger.add(7, 1)
+        self.assertEqual(len(ledger), 2)
+        self.assertEqual(ledger.consume(1), 3)
+        self.assertEqual(len(ledger), 2)
+        self.assertEqual(ledger.consume(0), 3)
+        self.assertEqual(ledger.consume(1), 3)
+        self.assertEqual(len(ledger), 1)
+        self.assertEqual(ledger.consume(1), 7)
+        self.assertEqual(len(ledger), 0)
+
+    def test_picks_across_entries(self):
+        ledger = OrderLedger()
+        for tick in range(4):
+            ledger.add(tick, 2)
+        self.assertEqual(ledger.consume(5), 2)
+        self.assertEqual(ledger.consume(3), 3)
+        self.assertEqual(len(ledger), 0)
+
+    def test_overdrawn(self):
+        ledger = OrderLedger()
+        ledger.add(1, 2)
+        self.assertEqual(ledger.consume(3), None)
+        self.assertEqual(len(ledger), 0)
+        self.assertEqual(ledger.consume(0), None)
+
+    def test_matches_record_scan(self):
+        rng = random.Random(0)
+        for trial in range(500):
+            ledger, records, outstanding = OrderLedger(), [], 0
+            for tick in range(60):
+                if rng.random() < 0.5:
+                    quantity = rng.randint(1, 3)
+                    outstanding += quantity
+                    records.append([tick, outstanding])
+                    ledger.add(tick, quantity)
+                else:
+                    quantity = rng.randint(1, outstanding + 1 if rng.random() < 0.1 else max(outstanding, 1))
+                    self.assertEqual(ledger.consume(quantity), consume_records(records, quantity))
+                    self.assertEqual(len(ledger), len(records))
+                    outstanding = sum(entry[1] for entry in ledger.entries) - ledger.consumed
+
+
+if __name__ == '__main__':
+    unittest.main()
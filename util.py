@@ -18,6 +18,8 @@ TASK_REWARD = 100
 DISCOUNTING_FACTOR = 0.999
 # initial task
 INITIAL_TASK = 1
+# travel steps one step of task time left is worth in the batch allocation of mode 1
+URGENCY_WEIGHT = 1
 # graphics on
 GRAPHICS_ON = 1
 # simulation time
@@ -52,6 +54,16 @@ def generate_random_station(world):
     return pos
 
 
+def calculate_discounted_reward(age):
+    """
+    Calculate the reward of a task completed age time steps after it arrived. The age is clamped at 0, so a task
+    is never worth more than TASK_REWARD and the power cannot overflow on long runs.
+    :param age: time steps
+    :return: discounted_reward
+    """
+    return TASK_REWARD * pow(DISCOUNTING_FACTOR, max(age, 0))
+
+
 def calculate_manhattan_distance(pos1, pos2):
     """
     Calculate the manhattan distance between two positions
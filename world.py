@@ -1,15 +1,26 @@
 from robotAgent import RobotAgent
 from task import Task
 from task import TaskAllocation
+from task import sample_orders
 from random import randint
 import util
 import search
-import Tkinter
 from actions import Actions
+from observer import WorldObserver
+from distance import DistanceOracle
+from occupancy import OccupancyIndex
+from cooperative import CooperativePlanner
+from incremental import IncrementalPlanner
+from hierarchical import HierarchicalPlanner
+from metrics import TickMetrics
+from zones import ZoneMap
+from state import FleetState, TaskState
+from timeit import default_timer
 
 
 class WorldState():
-    def __init__(self, width, height, gridSize, layout, stations,gridCost, mode, directional=False):
+    def __init__(self, width, height, gridSize, layout, stations,gridCost, mode, directional=False, planner='astar',
+                 allocator='greedy', zones=0, zone_workers=0):
         """
         Initialize the WorldState
         :param width:
@@ -19,13 +30,25 @@ class WorldState():
         :param stations:
         :param mode:
         :param directional:
+        :param planner: 'astar' plans every robot on its own, 'cooperative' plans conflict-free paths for the fleet,
+                        'dstar' repairs a kept search tree per robot, 'hpa' plans on a graph of clusters of the layout
+        :param allocator: mode 1 task allocation, 'greedy' gives the most urgent task to the closest robot one task
+                          at a time, 'batch' solves one assignment of the waiting tasks to the free robots per tick
+        :param zones: number of zones the batch allocation is partitioned into, 0 for one assignment of the floor
+        :param zone_workers: worker processes the zones are solved in, 0 or 1 for none
         """
         self.gridSize = gridSize
         self.width = width
         self.height = height
         self.layout = layout
+        self.layoutId = next(search.LAYOUT_IDS)
         self.stations = stations
         self.gridCost = gridCost
+        self.distanceOracle = DistanceOracle(gridCost)
+        self.occupancy = OccupancyIndex(stations)
+        self.savings = search.SavingsTable(self)
+        self.fleet = FleetState(self.distanceOracle)
+        self.taskState = TaskState()
         self.robots = []
         self.taskCache = []
         self.tasks = []
@@ -33,19 +56,26 @@ class WorldState():
         self.totalMileage = 0
         self.completedTask = 0
         self.directional = directional
-        self.graphics = []
-        self.canvas = []
+        self.graphics = WorldObserver()
+        self.metrics = TickMetrics()
         self.mode = mode
         self.completedOrder = 0
         self.taskRewards = 0
+        self.planner = planner
+        self.allocator = allocator
+        self.zoneMap = None
+        if zones:
+            self.zoneMap = ZoneMap(layout, width / gridSize, height / gridSize, zones, gridCost, zone_workers)
+        self.cooperativePlanner = CooperativePlanner(self) if planner == 'cooperative' else None
+        self.incrementalPlanner = IncrementalPlanner(self) if planner == 'dstar' else None
+        self.hierarchicalPlanner = HierarchicalPlanner(self) if planner == 'hpa' else None
 
     def set_graphics(self, graphics):
         """
-        Set the world graphics
-        :param graphics:
+        Attach a view to the world, the world runs headless until one is set
+        :param graphics: WorldObserver
         """
         self.graphics = graphics
-        self.canvas = self.graphics.canvas
 
     def set_wall_layout(self, layout):
         """
@@ -53,12 +83,9 @@ class WorldState():
         :param layout:
         """
         self.layout = layout
-        if self.graphics:
-            self.graphics.delete("all")
-            self.graphics.drawWalls()
-            self.graphics.drawGrids()
-            self.graphics.canvas.pack()
-            self.graphics.canvas.update()
+        # Paths cached for the old walls no longer apply
+        self.layoutId = next(search.LAYOUT_IDS)
+        self.graphics.on_layout_changed()
 
     def add_completed_order(self, order):
         """
@@ -73,10 +100,11 @@ class WorldState():
         :param pos: position of the robot to be added
         """
         if self.has_robot_at(pos) is False:
-            robot = RobotAgent(world=self, canvas=self.canvas, size=self.gridSize, pos=pos)
+            robot = RobotAgent(world=self, size=self.gridSize, pos=pos)
             self.robots.append(robot)
-            robot.id_task = self.canvas.create_text(self.width + 55, 110 + 20 * robot.id_text, fill="white",
-                                                anchor=Tkinter.W)
+            self.fleet.add(robot)
+            self.occupancy.add_robot(robot)
+            self.graphics.on_robot_added(robot)
         else:
             x, y = pos
             self.add_robot([x-1,y])
@@ -85,11 +113,35 @@ class WorldState():
         """
         Add a task to the world at pos
         :param pos: position of the task to be added
+        :return: task
         """
         task_index = len(self.tasks) + self.completedTask
-        task = Task(world=self, canvas=self.canvas, pos=pos, index=task_index)
+        task = Task(world=self, pos=pos, index=task_index)
         self.taskCache.append(task)
         self.tasks.append(task)
+        self.taskState.add(task)
+        self.occupancy.add_task(task)
+        if self.mode == 10:
+            self.savings.add_task(task)
+        self.graphics.on_task_added(task)
+        return task
+
+    def add_order(self, pos):
+        """
+        Add a task for an order of an order stream. Orders at positions robots cannot reach or at a station are dropped.
+        A cell holds one task at a time, an order at the cell of a task that is not completed yet is merged into it.
+        The task keeps the time step of its order, the reward of the task is discounted from it.
+        :param pos: position of the order
+        :return: boolean, whether a task was added
+        """
+        if self.distanceOracle.cell_index(pos) is None or self.has_station_at(pos):
+            self.metrics.count('orders_dropped')
+            return False
+        if self.has_task_at(pos):
+            self.metrics.count('orders_merged')
+            return False
+        self.add_task(pos).arrival = self.timer
+        return True
 
     def add_random_robot(self, num):
         """
@@ -152,10 +204,7 @@ class WorldState():
         :param pos: position to be checked
         :return: robot
         """
-        for robot in self.robots:
-            if robot.pos == pos:
-                return robot
-        return 0
+        return self.occupancy.find_robot(pos)
 
     def find_task_at(self, pos):
         """
@@ -163,10 +212,7 @@ class WorldState():
         :param pos: position to be checked
         :return: task
         """
-        for task in self.taskCache:
-            if task.pos == pos:
-                return task
-        return 0
+        return self.occupancy.find_task(pos)
 
     def find_station_at(self, pos):
         """
@@ -174,10 +220,7 @@ class WorldState():
         :param pos: position to be checked
         :return: station
         """
-        for station in self.stations:
-            if station.pos == pos:
-                return station
-        return 0
+        return self.occupancy.find_station(pos)
 
     def find_robot_with_task(self, task):
         """
@@ -250,14 +293,11 @@ class WorldState():
         Increment the world timer
         """
         self.timer += 1
-        self.canvas.itemconfig(self.graphics.timerLabel, text=str(self.timer))
 
     def check_tasks_status(self):
         """
         Check and handle any matter related to tasks at each time step
         """
-        self.canvas.itemconfig(self.graphics.taskCountLabel, text=str(len(self.tasks)))
-
         unassigned_task = []
         for task in self.tasks:
             if not self.find_robot_with_task(task):
@@ -284,9 +324,9 @@ class WorldState():
 
         # First Algorithm Mode
         if self.mode == 1:
+            self.taskState.timer_click()
+            sample_orders(self)
             for task in self.tasks:
-                task.timer_click()
-                task.check_order()
                 if not self.find_robot_with_task(task):
                     task.set_assign_status(False)
 
@@ -309,14 +349,20 @@ class WorldState():
                         else:
                             task.reset_progress()
 
-            for i in range(len(self.tasks)):
-                task = TaskAllocation.get_most_needed_unassigned_task(self)
-                if task:
-                    print 'most needed: ', task.index
-                    robot = TaskAllocation.get_closest_available_robot(self, task.pos)
-                    if robot:
-                        if robot.assignable:
-                            robot.set_task(task)
+            if self.allocator == 'batch':
+                for robot, task in TaskAllocation.assign_batch(self):
+                    self.metrics.count('allocations')
+                    robot.set_task(task)
+            else:
+                for i in range(len(self.tasks)):
+                    task = TaskAllocation.get_most_needed_unassigned_task(self)
+                    if task:
+                        print 'most needed: ', task.index
+                        robot = TaskAllocation.get_closest_available_robot(self, task.pos)
+                        self.metrics.count('allocations')
+                        if robot:
+                            if robot.assignable:
+                                robot.set_task(task)
 
         # Clarke and Wright Savings Algorithm Mode
         if self.mode == 10:
@@ -345,22 +391,36 @@ class WorldState():
         if self.has_robot_at(util.START_POINT[:]):
             r = self.find_robot_at(util.START_POINT[:])
             if not r.task:
-                r.capacityCount = 0
-                task = search.sort_task(self)
-                tmp_task = []
-                if task:
-                    for index in task:
-                        tmp_task.append(self.taskCache[index])
-                        r.add_task(tmp_task[-1])
-                    for i in tmp_task:
-                        self.taskCache.remove(i)
+                self.allocate_tasks(r)
+
+    def allocate_tasks(self, r):
+        """
+        Assign the next Clarke and Wright route of the unassigned tasks in self.taskCache to a robot
+        :param r: robot without tasks
+        """
+        r.capacityCount = 0
+        task = search.sort_task(self)
+        self.metrics.count('allocations')
+        tmp_task = []
+        if task:
+            for index in task:
+                tmp_task.append(self.taskCache[index])
+                r.add_task(tmp_task[-1])
+            for i in tmp_task:
+                self.taskCache.remove(i)
+                self.savings.remove_task(i)
 
     def update_robot_path(self):
         """
         setpath from current position to the next task position
         :return: None
         """
-        for robot in self.robots:
+        robots = self.robots
+        if self.cooperativePlanner:
+            # Robots plan in priority order, the ones working on tasks first
+            self.cooperativePlanner.begin_tick()
+            robots = sorted(self.robots, key=lambda r: (not r.task, r.index))
+        for robot in robots:
             if self.mode == 10:
                 par = robot.capacityCount
             else:
@@ -368,11 +428,15 @@ class WorldState():
             if True:
                 if robot.task:
                     if par < util.ROBOT_CAPACITY:
-                        rand = randint(0, 100)
-                        if not len(robot.path):
-                            robot.update_path_finder()
-                        elif rand > 50:
+                        if self.cooperativePlanner:
+                            # Cooperative plans stay valid until the robot leaves them, no random replanning
                             robot.update_path_finder()
+                        else:
+                            rand = randint(0, 100)
+                            if not len(robot.path):
+                                robot.update_path_finder()
+                            elif rand > 50:
+                                robot.update_path_finder()
                         if not TaskAllocation.is_task_station(robot.task):
                             robot.set_status("Fetching Order")
                     else:
@@ -403,10 +467,18 @@ class WorldState():
         """
         Update the world at each time step
         """
+        metrics = self.metrics
+        start = default_timer()
         self.timer_click()
+        start = metrics.lap('timer_click', start)
         self.check_tasks_status()
+        start = metrics.lap('check_tasks_status', start)
         self.check_robot_status()
+        start = metrics.lap('check_robot_status', start)
         self.graphics.update_status_bar()
+        start = metrics.lap('update_status_bar', start)
         if self.mode == 10:
             self.try_allocate_rob()
+            start = metrics.lap('try_allocate_rob', start)
         self.update_robot_path()
+        metrics.lap('update_robot_path', start)
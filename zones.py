@@ -0,0 +1,164 @@
+from assignment import finite_assignment
+from distance import DistanceOracle
+from state import travel_costs
+import bisect
+import multiprocessing
+import numpy
+
+# Distance oracle of a worker process, built once from the layout the worker is started with
+WORKER_ORACLE = None
+
+
+class ZoneMap():
+    """
+    Partition of the floor into zones of whole rack columns and aisles, as strips along x. The strips are cut at the
+    rack and aisle edges closest to an even split, so every aisle belongs to a single zone. The batch allocation of
+    mode 1 builds the costs and solves the assignment of every zone on its own, optionally in worker processes that
+    keep the distance rows of their zones, and then arbitrates the robots and tasks left over in every zone in one
+    assignment across zones.
+    """
+
+    def __init__(self, layout, cols, rows, count, grid_cost=None, workers=0):
+        """
+        :param layout: wall layout indexed [x][y], 1 for walls
+        :param cols: width of the floor in cells
+        :param rows: height of the floor in cells
+        :param count: number of zones, fewer if the floor has fewer rack and aisle edges
+        :param grid_cost: (dict)(x1, y1, x2, y2): cost of moving from (x1, y1) to (x2, y2), sent to the workers once
+        :param workers: worker processes the zones are solved in, 0 or 1 solves them in this process
+        """
+        self.cols = cols
+        self.bounds = self.cut(numpy.array([column[:rows] for column in layout[:cols]]), max(min(count, cols), 1))
+        self.count = len(self.bounds) + 1
+        self.gridCost = grid_cost
+        self.workers = min(workers, self.count) if grid_cost is not None else 0
+        self.pools = []
+
+    @staticmethod
+    def cut(walls, count):
+        """
+        Return the first columns of the zones after the first one, at the edges between rack columns and aisles that
+        are closest to an even split of the floor. A floor without racks is split evenly.
+        :param walls: (numpy array) wall mask indexed [x, y]
+        :param count: number of zones
+        :return: (list) increasing columns
+        """
+        cols = walls.shape[0]
+        # Aisles are the inner columns without walls between the border rows, rack columns have some
+        free = (walls[1:cols - 1, 1:-1] == 0).sum(axis=1)
+        rack = free < free.max() if len(free) else free
+        edges = [x for x in range(2, cols - 1) if rack[x - 1] != rack[x - 2]]
+        bounds = []
+        for k in range(1, count):
+            even = k * cols // count
+            if edges:
+                even = min(edges, key=lambda x: (abs(x - even), x))
+            if (not bounds or even > bounds[-1]) and 0 < even < cols:
+                bounds.append(even)
+        return bounds
+
+    def zone_of(self, pos):
+        """
+        :param pos:
+        :return: zone index
+        """
+        return bisect.bisect_right(self.bounds, pos[0])
+
+    def zones_of(self, positions):
+        """
+        :param positions: (numpy array) n x 2 positions
+        :return: (numpy array) zone index per position
+        """
+        return numpy.searchsorted(self.bounds, positions[:, 0], side='right')
+
+    def get_pools(self):
+        """
+        Start the worker processes on first use, one single process pool per worker so every zone is always solved
+        by the same worker and finds its distance rows cached there
+        :return: (list) pools
+        """
+        if not self.pools:
+            self.pools = [multiprocessing.Pool(1, init_worker, (self.gridCost,)) for w in range(self.workers)]
+        return self.pools
+
+    def assign(self, fleet, robot_slots, task_pos, urgency):
+        """
+        Assign robots to tasks within their zones, then the robots and tasks left unassigned across zones. The
+        result is optimal within every zone but not necessarily for the whole floor.
+        :param fleet: FleetState of the robots
+        :param robot_slots: (numpy array) slots of the robots
+        :param task_pos: (numpy array) n x 2 positions of the tasks
+        :param urgency: (numpy array) cost added to every task
+        :return: (numpy array) robots x tasks cost matrix, inf for unreachable pairs, (list)(robot, task) index pairs
+        """
+        positions = fleet.pos[robot_slots]
+        cells = fleet.cell[robot_slots]
+        row_zones = self.zones_of(positions)
+        col_zones = self.zones_of(task_pos)
+        jobs = []
+        for zone in range(self.count):
+            cols = numpy.nonzero(col_zones == zone)[0]
+            if len(cols):
+                jobs.append((zone, cols, (positions, cells, task_pos[cols], urgency[cols],
+                                    numpy.nonzero(row_zones == zone)[0])))
+        if self.workers > 1:
+            pools = self.get_pools()
+            results = [pools[zone % len(pools)].apply_async(solve_zone, (job,)) for zone, cols, job in jobs]
+            results = [result.get() for result in results]
+        else:
+            results = [zone_assignment(fleet.oracle, job) for zone, cols, job in jobs]
+
+        cost = numpy.empty((len(robot_slots), len(task_pos)))
+        pairs = []
+        for (zone, cols, job), (columns, zone_pairs) in zip(jobs, results):
+            cost[:, cols] = columns
+            pairs.extend((i, cols[j]) for i, j in zone_pairs)
+
+        # Arbitration of the robots and tasks that found no partner in their zone
+        free_rows = numpy.setdiff1d(numpy.arange(cost.shape[0]), [i for i, j in pairs])
+        free_cols = numpy.setdiff1d(numpy.arange(cost.shape[1]), [j for i, j in pairs])
+        if len(free_rows) and len(free_cols):
+            pairs.extend((free_rows[i], free_cols[j])
+                         for i, j in finite_assignment(cost[numpy.ix_(free_rows, free_cols)]))
+        return cost, pairs
+
+    def close(self):
+        """
+        Stop the worker processes
+        """
+        for pool in self.pools:
+            pool.close()
+            pool.join()
+        self.pools = []
+
+
+def zone_assignment(oracle, job):
+    """
+    Build the cost columns of the tasks of a zone and assign them to the robots of the zone
+    :param oracle: DistanceOracle of the layout
+    :param job: positions, oracle cells and rows in the zone of the robots, positions and urgency of the tasks
+    :return: (numpy array) robots x zone tasks costs, (list)(row, zone task) pairs
+    """
+    positions, cells, task_pos, urgency, rows = job
+    columns = numpy.empty((len(positions), len(task_pos)))
+    for k in range(len(task_pos)):
+        columns[:, k] = travel_costs(oracle, positions, cells, task_pos[k]) + urgency[k]
+    if not len(rows):
+        return columns, []
+    return columns, [(rows[i], j) for i, j in finite_assignment(columns[rows])]
+
+
+def init_worker(grid_cost):
+    """
+    Build the distance oracle of a worker process from the layout, once
+    :param grid_cost: (dict)(x1, y1, x2, y2): cost of moving from (x1, y1) to (x2, y2)
+    """
+    global WORKER_ORACLE
+    WORKER_ORACLE = DistanceOracle(grid_cost)
+
+
+def solve_zone(job):
+    """
+    zone_assignment in a worker process
+    """
+    return zone_assignment(WORKER_ORACLE, job)